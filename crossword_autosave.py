@@ -0,0 +1,91 @@
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from PySide2.QtCore import QCoreApplication, QObject, QTimer, Signal
+from crossword_store import solutionRecord
+
+# milliseconds from the first unsaved edit to the write that saves it, so
+# that a burst of typing ends up in one write
+autosave_delay = 2000
+
+class SolutionAutosaver(QObject):
+  # writes a model's solution_data to its puzzle store after it changes, on
+  # a writer thread so that the UI thread never waits for the disk. The
+  # writer reports back through saved(requested) and failed(message), which
+  # reach the UI thread queued; requested is True for an explicit save
+  saved = Signal(bool)
+  failed = Signal(str)
+
+  def __init__(self, model, delay=autosave_delay):
+    QObject.__init__(self, model)
+    self.model = model
+    self.dirty_cells = set()
+    self.writes = 0
+    self.failures = 0
+    self.pending = None
+    self.writer = ThreadPoolExecutor(max_workers=1)
+    self.timer = QTimer(self)
+    self.timer.setSingleShot(True)
+    self.timer.setInterval(delay)
+    self.timer.timeout.connect(self.save)
+    self.closed = False
+    app = QCoreApplication.instance()
+    if app:
+      app.aboutToQuit.connect(self.flush)
+
+  def mark_dirty(self, cells):
+    self.dirty_cells.update(cells)
+    if self.dirty_cells and not self.timer.isActive():
+      self.timer.start()
+
+  def mark_clean(self):
+    self.dirty_cells.clear()
+    self.timer.stop()
+
+  def write(self, store, source, crossword_index, record, requested):
+    # runs on the writer thread
+    try:
+      store.save_solution(source, crossword_index, *record)
+    except sqlite3.Error as e:
+      self.failures += 1
+      self.failed.emit('Could not save the solution: {}'.format(e))
+      return
+    self.saved.emit(requested)
+
+  def save(self, force=False, requested=False):
+    # force writes even without unsaved edits; requested marks a save the
+    # user asked for, which saved reports back
+    self.timer.stop()
+    if self.closed or (not self.dirty_cells and not force):
+      return
+    self.dirty_cells.clear()
+    if self.model.crossword_index is None:
+      # the placeholder shown before any puzzle has been fetched
+      return
+    if not np.any(self.model.solution_data):
+      # a cleared grid keeps the stored solution, so that it can still be
+      # loaded again until something new is entered
+      return
+    # the cells are taken on the UI thread, so later edits cannot tear them
+    record = solutionRecord(self.model.solution_data, self.model.grid_data)
+    self.writes += 1
+    self.pending = self.writer.submit(self.write, self.model.store, self.model.source, self.model.crossword_index, record,
+                                      requested)
+
+  def flush(self):
+    # used on quit: saves what is left and waits for the writer
+    self.save()
+    if self.pending:
+      self.pending.result()
+
+  def close(self):
+    # used when the puzzle is swapped: saves what is left, stops the writer
+    # thread and lets go of the application, so the model can be freed
+    if self.closed:
+      return
+    self.flush()
+    self.closed = True
+    self.writer.shutdown(wait=True)
+    app = QCoreApplication.instance()
+    if app:
+      app.aboutToQuit.disconnect(self.flush)
@@ -0,0 +1,92 @@
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, datetime, timedelta
+from crossword_epaper import crosswordIndexForDay, imageUrlForDay, newSession
+from crossword_http import checkImage
+
+default_workers = 8
+manifest_file = 'backfill-manifest.json'
+
+def daysInRange(start, end):
+  for offset in range((end - start).days + 1):
+    yield start + timedelta(days=offset)
+
+def fetchImage(session, day, filename):
+  started = time.perf_counter()
+  url = imageUrlForDay(day)
+  response = session.get(url, timeout=30)
+  response.raise_for_status()
+  if not response.content:
+    raise IOError('empty response')
+  checkImage(url, response)
+  temp_filename = filename + '.part'
+  with open(temp_filename, 'wb') as f:
+    f.write(response.content)
+  os.replace(temp_filename, filename)
+  return len(response.content), time.perf_counter() - started
+
+def backfillImages(start, end, folder='.', workers=default_workers):
+  entries = []
+  pending = {}
+  started = time.perf_counter()
+  with newSession(workers) as session, ThreadPoolExecutor(max_workers=workers) as executor:
+    for day in daysInRange(start, end):
+      crossword_index = crosswordIndexForDay(day)
+      filename = os.path.join(folder, 'image-{}.png'.format(crossword_index))
+      entry = {'date': day.isoformat(), 'crossword_index': crossword_index, 'file': filename}
+      entries.append(entry)
+      if os.path.isfile(filename):
+        entry['status'] = 'skipped'
+        continue
+      pending[executor.submit(fetchImage, session, day, filename)] = entry
+
+    for future in as_completed(pending):
+      entry = pending[future]
+      try:
+        entry['bytes'], entry['seconds'] = future.result()
+        entry['status'] = 'fetched'
+      except Exception as e:
+        entry['status'] = 'failed'
+        entry['error'] = str(e)
+  elapsed = time.perf_counter() - started
+  return entries, elapsed
+
+def writeManifest(entries, elapsed, filename=manifest_file):
+  manifest = {
+    'written': datetime.now().isoformat(timespec='seconds'),
+    'elapsed': elapsed,
+    'entries': entries,
+  }
+  with open(filename, 'w', encoding='utf-8') as f:
+    json.dump(manifest, f, indent=1)
+
+def printReport(entries, elapsed):
+  fetched = [e for e in entries if e['status'] == 'fetched']
+  failed = [e for e in entries if e['status'] == 'failed']
+  skipped = len(entries) - len(fetched) - len(failed)
+  total_bytes = sum(e['bytes'] for e in fetched)
+  print('Fetched {} crosswords ({:.1f} MB), skipped {}, failed {} in {:.1f}s'.format(
+    len(fetched), total_bytes / 1e6, skipped, len(failed), elapsed))
+  if elapsed > 0:
+    print('Throughput: {:.2f} crosswords/s, {:.2f} MB/s'.format(len(fetched) / elapsed, total_bytes / 1e6 / elapsed))
+  for e in failed:
+    print('  {} (crossword {}): {}'.format(e['date'], e['crossword_index'], e['error']))
+
+def parseDate(text):
+  return datetime.strptime(text, '%Y-%m-%d').date()
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description='Download the epaper crossword images for a range of dates')
+  parser.add_argument('start', type=parseDate, help='first date, YYYY-MM-DD')
+  parser.add_argument('end', type=parseDate, nargs='?', default=date.today(), help='last date, YYYY-MM-DD (default: today)')
+  parser.add_argument('--folder', default='.', help='where image-<index>.png files are kept')
+  parser.add_argument('--workers', type=int, default=default_workers, help='concurrent downloads')
+  parser.add_argument('--manifest', default=manifest_file, help='where the JSON manifest is written')
+  args = parser.parse_args()
+
+  entries, elapsed = backfillImages(args.start, args.end, args.folder, args.workers)
+  printReport(entries, elapsed)
+  writeManifest(entries, elapsed, args.manifest)
@@ -0,0 +1,56 @@
+import argparse
+import glob
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from crossword_pipeline import pipelineForImage
+
+image_file_pattern = re.compile(r'image-(\d+)\.(png|jpg)$')
+
+def findImageFiles(folder):
+  image_files = []
+  for extension in ('png', 'jpg'):
+    image_files += glob.glob(os.path.join(folder, 'image-*.{}'.format(extension)))
+  return sorted(f for f in image_files if image_file_pattern.search(f))
+
+def convertImageToIpuz(image_file, output_folder):
+  # runs in a worker process; errors are returned rather than raised so
+  # that one bad puzzle never aborts the batch
+  crossword_index = image_file_pattern.search(image_file).group(1)
+  ipuz_file = os.path.join(output_folder, 'crossword-{}.ipuz'.format(crossword_index))
+  try:
+    pipeline = pipelineForImage(image_file, folder=os.path.dirname(image_file))
+    grid = pipeline.file_grid(image_file)
+    pipeline.export(grid, crossword_index, ipuz_file)
+  except Exception as e:
+    return image_file, None, '{}: {}'.format(type(e).__name__, e)
+  return image_file, ipuz_file, None
+
+def convertFolderToIpuz(folder, output_folder, workers=None):
+  os.makedirs(output_folder, exist_ok=True)
+  written, errors = [], []
+  with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as executor:
+    futures = [executor.submit(convertImageToIpuz, f, output_folder) for f in findImageFiles(folder)]
+    for future in as_completed(futures):
+      image_file, ipuz_file, error = future.result()
+      if error:
+        errors.append((image_file, error))
+      else:
+        written.append(ipuz_file)
+  return sorted(written), sorted(errors)
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description='Convert a folder of crossword images and clue files to .ipuz files')
+  parser.add_argument('folder', help='folder with image-<index>.png/.jpg and horizontal/vertical-clues-<index>.txt files')
+  parser.add_argument('--output', default='ipuz', help='folder the .ipuz files are written to')
+  parser.add_argument('--workers', type=int, default=None, help='worker processes (default: one per core)')
+  args = parser.parse_args()
+
+  started = time.perf_counter()
+  written, errors = convertFolderToIpuz(args.folder, args.output, args.workers)
+  print('Wrote {} ipuz files in {:.1f}s'.format(len(written), time.perf_counter() - started))
+  for image_file, error in errors:
+    print('  {}: {}'.format(image_file, error))
+  sys.exit(1 if errors else 0)
@@ -0,0 +1,149 @@
+import argparse
+import json
+import os
+import subprocess
+import tempfile
+import time
+from datetime import datetime
+import cv2
+import numpy as np
+import crossword_pipeline
+from crossword_pipeline import AnandabazarPipeline, EpaperPipeline
+from crossword_classifier import cellBounds
+
+page_width = 800
+page_height = 900
+
+def randomLayout(rng, shape=(15, 15), black_ratio=0.2):
+  # 1 for a word cell, 0 for a black cell, point symmetric like the real puzzles
+  black = rng.random(shape) < black_ratio / 2
+  black |= black[::-1, ::-1]
+  return (~black).astype(int)
+
+def gridBox(shift=(0, 0)):
+  return (crossword_pipeline.grid_top + shift[0], crossword_pipeline.grid_bottom + shift[0],
+          crossword_pipeline.grid_left + shift[1], crossword_pipeline.grid_right + shift[1])
+
+def renderSyntheticPage(layout, rng, noise=0.0, jpeg_quality=None, contrast=1.0, shift=(0, 0)):
+  # shift moves the grid away from the grid_top/grid_left coordinates, as
+  # happens when the epaper layout changes
+  # drawn on uint8, which is all cv2.putText draws on
+  page = np.full((page_height, page_width), 250, dtype=np.uint8)
+  top, bottom, left, right = gridBox(shift)
+  ystarts, yends = cellBounds(bottom - top, layout.shape[0])
+  xstarts, xends = cellBounds(right - left, layout.shape[1])
+  for i in range(layout.shape[0]):
+    for j in range(layout.shape[1]):
+      y0, y1 = top + ystarts[i], top + yends[i]
+      x0, x1 = left + xstarts[j], left + xends[j]
+      if not layout[i][j]:
+        page[y0:y1, x0:x1] = 15
+      elif rng.random() < 0.35:
+        cv2.putText(page, str(rng.integers(1, 100)), (int(x0) + 2, int(y0) + 10), cv2.FONT_HERSHEY_PLAIN, 0.6, 20, 1)
+      cv2.rectangle(page, (int(x0), int(y0)), (int(x1), int(y1)), 40, 1)
+
+  page = (page.astype(np.float32) - 128) * contrast + 128
+  if noise:
+    page += rng.normal(0, noise, page.shape)
+  page = np.clip(page, 0, 255).astype(np.uint8)
+  page = cv2.cvtColor(page, cv2.COLOR_GRAY2BGR)
+  if jpeg_quality:
+    _, encoded = cv2.imencode('.jpg', page, [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality])
+    page = cv2.imdecode(encoded, cv2.IMREAD_COLOR)
+  return page
+
+def detectors():
+  # name -> function(page_file, grid_file, grid); the epaper pipeline works on
+  # the whole page, the anandabazar one on the cropped grid image
+  def detector(pipeline, page):
+    def detect(page_file, grid_file, grid):
+      grid[:] = pipeline.detect(page_file if page else grid_file, grid.shape[:2])
+    return detect
+
+  return {
+    'epaper': detector(EpaperPipeline(), True),
+    'epaper/legacy_kmeans': detector(EpaperPipeline(legacy_kmeans=True), True),
+    'anandabazar': detector(AnandabazarPipeline(), False),
+    'anandabazar/legacy_kmeans': detector(AnandabazarPipeline(legacy_kmeans=True), False),
+  }
+
+def writePages(folder, pages, rng, noise, jpeg_quality, contrast, shift):
+  samples = []
+  top, bottom, left, right = gridBox(shift)
+  for k in range(pages):
+    layout = randomLayout(rng)
+    page = renderSyntheticPage(layout, rng, noise, jpeg_quality, contrast, shift)
+    page_file = os.path.join(folder, 'page-{}.png'.format(k))
+    grid_file = os.path.join(folder, 'grid-{}.jpg'.format(k))
+    cv2.imwrite(page_file, page)
+    cv2.imwrite(grid_file, page[top:bottom, left:right])
+    samples.append((page_file, grid_file, layout))
+  return samples
+
+def runBenchmark(pages=20, repeat=3, noise=0.0, jpeg_quality=None, contrast=1.0, shift=(0, 0), seed=0):
+  rng = np.random.default_rng(seed)
+  results = {}
+  cwd = os.getcwd()
+  with tempfile.TemporaryDirectory() as folder:
+    samples = writePages(folder, pages, rng, noise, jpeg_quality, contrast, shift)
+    # the locator keeps its cache in the working directory
+    os.chdir(folder)
+    try:
+      for name, detect in detectors().items():
+        seconds = []
+        wrong_cells = failures = cells = 0
+        for page_file, grid_file, layout in samples:
+          for _ in range(repeat):
+            grid = np.zeros(layout.shape + (3,), dtype=int)
+            started = time.perf_counter()
+            try:
+              detect(page_file, grid_file, grid)
+            except AssertionError:
+              failures += 1
+              continue
+            seconds.append(time.perf_counter() - started)
+            cells += layout.size
+            wrong_cells += int(np.count_nonzero(grid[:, :, 0] != layout))
+        total = sum(seconds)
+        results[name] = {
+          'seconds_per_page': total / len(seconds) if seconds else None,
+          'cells_per_second': cells / total if total else None,
+          'error_rate': wrong_cells / cells if cells else None,
+          'failures': failures,
+        }
+    finally:
+      os.chdir(cwd)
+  return results
+
+def gitRevision():
+  try:
+    return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL).decode().strip()
+  except (OSError, subprocess.CalledProcessError):
+    return None
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description='Benchmark the image to grid detectors on synthetic epaper pages')
+  parser.add_argument('--pages', type=int, default=20, help='synthetic pages to generate')
+  parser.add_argument('--repeat', type=int, default=3, help='runs per page and detector')
+  parser.add_argument('--noise', type=float, default=0.0, help='standard deviation of gaussian pixel noise')
+  parser.add_argument('--jpeg-quality', type=int, default=None, help='round-trip pages through JPEG at this quality')
+  parser.add_argument('--contrast', type=float, default=1.0, help='contrast factor around mid gray')
+  parser.add_argument('--shift', type=int, nargs=2, default=(0, 0), metavar=('DY', 'DX'),
+                      help='move the grid this many pixels from its usual place')
+  parser.add_argument('--seed', type=int, default=0)
+  parser.add_argument('--output', default='benchmark.json', help='JSON file the results are written to')
+  args = parser.parse_args()
+
+  settings = {'pages': args.pages, 'repeat': args.repeat, 'noise': args.noise,
+              'jpeg_quality': args.jpeg_quality, 'contrast': args.contrast, 'shift': tuple(args.shift),
+              'seed': args.seed}
+  results = runBenchmark(**settings)
+  for name, result in results.items():
+    print('{:36} {:>10} cells/s  error {:>7}  failures {}'.format(
+      name,
+      '{:.0f}'.format(result['cells_per_second']) if result['cells_per_second'] else '-',
+      '{:.4f}'.format(result['error_rate']) if result['error_rate'] is not None else '-',
+      result['failures']))
+  with open(args.output, 'w') as f:
+    json.dump({'revision': gitRevision(), 'time': datetime.now().isoformat(timespec='seconds'),
+               'settings': settings, 'results': results}, f, indent=1)
@@ -0,0 +1,147 @@
+import argparse
+import os
+import subprocess
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from datetime import date
+import bangla
+from crossword_store import PuzzleStore, store_file
+
+# puzzles handed to a worker process at a time
+render_chunk_size = 16
+# chunks waiting or rendered per worker process; the puzzles read ahead of
+# the page being written and the pages not yet written stay within this
+pending_chunks_per_worker = 2
+
+preamble = (
+  r'\documentclass{article}' '\n'
+  r'\usepackage[banglamainfont=Kalpurush, banglattfont=Siyam Rupali]{latexbangla}' '\n'
+  r'\usepackage{cwpuzzle}' '\n'
+  r'\usepackage{graphicx}' '\n'
+  r'\begin{document}' '\n'
+)
+postamble = r'\end{document}' '\n'
+
+tex_special_characters = {
+  '\\': r'\textbackslash{}', '{': r'\{', '}': r'\}', '$': r'\$', '&': r'\&',
+  '#': r'\#', '_': r'\_', '%': r'\%', '~': r'\textasciitilde{}', '^': r'\textasciicircum{}',
+}
+tex_escapes = str.maketrans(tex_special_characters)
+
+def escapeTex(text):
+  return text.translate(tex_escapes)
+
+def gridTex(grid):
+  # cwpuzzle takes the width first; every word cell gets its clue number
+  rows, columns = grid.shape[0], grid.shape[1]
+  lines = [r'\begin{Puzzle}{%d}{%d}%%' % (columns, rows)]
+  for i in range(rows):
+    cells = []
+    for j in range(columns):
+      if not grid[i][j][0]:
+        cells.append('*')
+      else:
+        clue_index = grid[i][j][1] or grid[i][j][2]
+        cells.append('[{}]X'.format(clue_index) if clue_index else 'X')
+    lines.append('\t|' + '|'.join(cells) + '|.')
+  lines.append(r'\end{Puzzle}')
+  return lines
+
+def cluesTex(title, clues):
+  lines = [r'\begin{PuzzleClues}{\textbf{%s}}%%' % title]
+  lines += [r'\Clue{%s}{}{%s}%%' % (number, escapeTex(clue)) for number, clue in clues]
+  lines.append(r'\end{PuzzleClues}%')
+  return lines
+
+def puzzleTex(puzzle):
+  # one page of the book; puzzle is (crossword_index, day, grid, across,
+  # down, clue_images) and runs in a worker process, so it is plain data
+  crossword_index, day, grid, across, down, clue_images = puzzle
+  title = 'শব্দছক {}'.format(bangla.convert_english_digit_to_bangla_digit(str(crossword_index)))
+  lines = [r'\section*{%s\hfill %s}' % (title, day or '')]
+  lines += gridTex(grid)
+  if across or down:
+    lines += cluesTex('Across', across)
+    lines += cluesTex('Down', down)
+  else:
+    # the epaper clues are images cut out of the page
+    lines += [r'\par\includegraphics[width=\linewidth]{%s}' % path.replace('\\', '/') for path in clue_images]
+  lines.append(r'\newpage')
+  return '\n'.join(lines) + '\n'
+
+def chunkTex(chunk):
+  return ''.join(puzzleTex(puzzle) for puzzle in chunk)
+
+def bookPuzzles(store, source, first_day, last_day):
+  # one puzzle at a time, in date order, straight from the store's cursor
+  for crossword_index, day, grid, files in store.puzzles_between(source, first_day, last_day):
+    across, down = store.clues(source, crossword_index)
+    clue_images = [files[name] for name in ('right_clues', 'down_clues') if os.path.isfile(files.get(name, ''))]
+    yield crossword_index, day, grid, across, down, clue_images
+
+def writeBook(puzzles, filename, workers=None):
+  # renders the pages on worker processes and writes each one as soon as it
+  # is its turn, so the book is never held in memory; returns the page count
+  pages = 0
+  with open(filename + '.part', 'w', encoding='utf-8') as f:
+    f.write(preamble)
+    if workers == 1:
+      for puzzle in puzzles:
+        f.write(puzzleTex(puzzle))
+        pages += 1
+    else:
+      # executor.map would take every puzzle off the cursor up front, so
+      # chunks are submitted only as the oldest one is written
+      workers = workers or os.cpu_count()
+      puzzles = iter(puzzles)
+      pending = deque()
+      with ProcessPoolExecutor(max_workers=workers) as executor:
+        while True:
+          while len(pending) < pending_chunks_per_worker * workers:
+            chunk = list(islice(puzzles, render_chunk_size))
+            if not chunk:
+              break
+            pending.append((executor.submit(chunkTex, chunk), len(chunk)))
+          if not pending:
+            break
+          rendered, count = pending.popleft()
+          f.write(rendered.result())
+          pages += count
+    f.write(postamble)
+  os.replace(filename + '.part', filename)
+  return pages
+
+def writeTexFile(grid, crossword_index, filename, folder='.'):
+  # a single puzzle with the clues of its own clue files, as a one page book
+  from crossword_pipeline import readPuzzleClues
+  across, down = readPuzzleClues(crossword_index, folder)
+  return writeBook([(crossword_index, None, grid, across, down, [])], filename, workers=1)
+
+def typeset(filename):
+  # latexbangla needs XeLaTeX
+  folder = os.path.dirname(os.path.abspath(filename))
+  subprocess.run(['xelatex', '-interaction=nonstopmode', os.path.basename(filename)], cwd=folder, check=True)
+  return os.path.splitext(filename)[0] + '.pdf'
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description='Typeset the stored puzzles of a date range as one cwpuzzle book')
+  parser.add_argument('first_day', type=date.fromisoformat, help='YYYY-MM-DD')
+  parser.add_argument('last_day', type=date.fromisoformat, help='YYYY-MM-DD')
+  parser.add_argument('--source', default='anandabazar', choices=['anandabazar', 'epaper'])
+  parser.add_argument('--store', default=store_file, help='SQLite file of the store')
+  parser.add_argument('--output', default='crossword-book.tex', help='LaTeX file to write')
+  parser.add_argument('--workers', type=int, default=None, help='worker processes (default: one per core)')
+  parser.add_argument('--pdf', action='store_true', help='run xelatex on the book afterwards')
+  args = parser.parse_args()
+
+  started = time.perf_counter()
+  store = PuzzleStore(args.store)
+  pages = writeBook(bookPuzzles(store, args.source, args.first_day, args.last_day), args.output, args.workers)
+  print('Wrote {} puzzles to {} in {:.1f}s'.format(pages, args.output, time.perf_counter() - started))
+  if pages == 0:
+    sys.exit(1)
+  if args.pdf:
+    print('Typeset {}'.format(typeset(args.output)))
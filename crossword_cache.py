@@ -0,0 +1,53 @@
+import glob
+import hashlib
+import json
+import os
+import numpy as np
+import crossword_classifier
+
+grid_cache_folder = 'grid-cache'
+
+def detectorSettings(layout):
+  # everything besides the image that a detected grid depends on, as text;
+  # the locator imports this module, hence the late import
+  from crossword_locator import locatorSettings
+  detector = {
+    'locator': locatorSettings(),
+    'detector_version': crossword_classifier.detector_version,
+    'batch_iterations': crossword_classifier.batch_iterations,
+    'min_confidence': crossword_classifier.min_confidence,
+    'min_cluster_separation': crossword_classifier.min_cluster_separation,
+  }
+  return json.dumps([detector, layout], sort_keys=True)
+
+def gridCacheKey(filename, layout):
+  digest = hashlib.sha256()
+  with open(filename, 'rb') as f:
+    digest.update(f.read())
+  digest.update(detectorSettings(layout).encode('utf-8'))
+  return digest.hexdigest()
+
+def gridCachePath(filename, key):
+  # sidecar named after the image, so that stale entries of the same image
+  # can be found and removed when a new one is stored
+  return os.path.join(grid_cache_folder, '{}-{}.npy'.format(os.path.basename(filename), key))
+
+def loadCachedGrid(filename, layout):
+  try:
+    grid = np.load(gridCachePath(filename, gridCacheKey(filename, layout)), allow_pickle=False)
+  except (IOError, ValueError, EOFError):
+    return None
+  if grid.ndim != 3 or grid.shape[2] != 3:
+    return None
+  return grid
+
+def storeCachedGrid(filename, layout, grid):
+  os.makedirs(grid_cache_folder, exist_ok=True)
+  path = gridCachePath(filename, gridCacheKey(filename, layout))
+  for stale_path in glob.glob(gridCachePath(filename, '*')):
+    if stale_path != path:
+      os.unlink(stale_path)
+  temp_path = path + '.tmp'
+  with open(temp_path, 'wb') as f:
+    np.save(f, grid)
+  os.replace(temp_path, path)
@@ -0,0 +1,114 @@
+import math
+import numpy as np
+
+# bump whenever a change to the detector can change its output
+detector_version = 4
+# number of 2-means refinement steps run on every cell at once
+batch_iterations = 8
+# cells whose confidence is below this are handed to cv2.kmeans
+min_confidence = 0.2
+# clusters closer than this are noise on a single-colour cell
+min_cluster_separation = 48
+# cv2's random number generator is seeded with this before the legacy
+# k-means, so that an A/B run can be repeated
+legacy_kmeans_seed = 0
+
+def cellBounds(length, count):
+  starts = np.array([math.ceil(length * k / count) for k in range(count)])
+  ends = np.array([math.floor(length * (k + 1) / count) for k in range(count)])
+  return starts, ends
+
+def equalCellBounds(image_gray, shape):
+  # the grid divided into equal parts, as convertImageToGrid has always done
+  nrows, ncols = image_gray.shape
+  return cellBounds(nrows, shape[0]) + cellBounds(ncols, shape[1])
+
+def cellSlice(image_gray, bounds, i, j):
+  ystarts, yends, xstarts, xends = bounds
+  return image_gray[ystarts[i]:yends[i], xstarts[j]:xends[j]]
+
+def cellView(image_gray, bounds):
+  # (rows, cols, h, w) view of the grid; cells are trimmed to the smallest
+  # cell size so that every cell has the same number of pixels
+  ystarts, yends, xstarts, xends = bounds
+  cell_height = int(np.min(yends - ystarts))
+  cell_width = int(np.min(xends - xstarts))
+  ys = ystarts[:, None] + np.arange(cell_height)
+  xs = xstarts[:, None] + np.arange(cell_width)
+  return image_gray[ys[:, None, :, None], xs[None, :, None, :]]
+
+def batchDominantIntensity(cells, iterations=batch_iterations):
+  # deterministic 2-means over every cell at once, seeded with the darkest
+  # and brightest pixel of each cell
+  pixels = cells.reshape(cells.shape[0], cells.shape[1], -1).astype(np.float32)
+  n_pixels = pixels.shape[2]
+  total = pixels.sum(axis=2)
+  low = pixels.min(axis=2)
+  high = pixels.max(axis=2)
+  for _ in range(max(iterations, 1)):
+    upper = pixels > ((low + high) / 2)[..., None]
+    n_upper = upper.sum(axis=2)
+    n_lower = n_pixels - n_upper
+    sum_upper = np.where(upper, pixels, 0).sum(axis=2)
+    high = np.where(n_upper > 0, sum_upper / np.maximum(n_upper, 1), high)
+    low = np.where(n_lower > 0, (total - sum_upper) / np.maximum(n_lower, 1), low)
+  dominant = np.where(n_upper > n_lower, high, low)
+  share = np.maximum(n_upper, n_lower) / n_pixels
+  uniform = high - low < min_cluster_separation
+  dominant = np.where(uniform, total / n_pixels, dominant)
+  share = np.where(uniform, 1.0, share)
+  return dominant, share
+
+def kmeansDominantIntensity(cell, legacy=False):
+  import cv2
+  pixels = np.float32(cell.reshape(-1))
+  n_colors = 2
+  criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 200, .1)
+  if legacy:
+    # what convertImageToGrid has always run on every cell
+    initial_labels, attempts, flags = None, 10, cv2.KMEANS_RANDOM_CENTERS
+  else:
+    # starts from the pixels above and below the mean, so that a cell always
+    # gets the same value and the grid cache keeps what every run would find
+    initial_labels = (pixels > pixels.mean()).astype(np.int32).reshape(-1, 1)
+    attempts, flags = 1, cv2.KMEANS_USE_INITIAL_LABELS
+
+  _, labels, palette = cv2.kmeans(pixels, n_colors, initial_labels, criteria, attempts, flags)
+  _, counts = np.unique(labels, return_counts=True)
+  dominant = palette[np.argmax(counts)][0]
+  return float(dominant), np.max(counts) / pixels.size
+
+def shareToConfidence(share, grid_val):
+  # 0 when the two clusters are the same size, 1 for a single-colour cell
+  return 2 * share - 1 if grid_val in (0, 1) else 0.0
+
+def classifyGridCells(image_gray, shape, yValToGridVal, legacy_kmeans=False, bounds=None, counts=None):
+  # returns the 0/1/-1 value of every cell and a confidence in [0, 1];
+  # bounds are the (ystarts, yends, xstarts, xends) of the cells and default
+  # to the image divided into equal parts. counts, if given, gets the
+  # number of cells that needed cv2.kmeans
+  rows, cols = shape[0], shape[1]
+  if bounds is None:
+    bounds = equalCellBounds(image_gray, shape)
+  values = np.full((rows, cols), -1, dtype=int)
+  confidence = np.zeros((rows, cols))
+
+  if legacy_kmeans:
+    import cv2
+    cv2.setRNGSeed(legacy_kmeans_seed)
+    ambiguous = [(i, j) for i in range(rows) for j in range(cols)]
+  else:
+    dominant, share = batchDominantIntensity(cellView(image_gray, bounds))
+    for i in range(rows):
+      for j in range(cols):
+        values[i][j] = yValToGridVal(dominant[i][j])
+        confidence[i][j] = shareToConfidence(share[i][j], values[i][j])
+    ambiguous = list(zip(*np.nonzero(confidence < min_confidence)))
+  if counts is not None:
+    counts['kmeans_cells'] = len(ambiguous)
+
+  for i, j in ambiguous:
+    dominant, share = kmeansDominantIntensity(cellSlice(image_gray, bounds, i, j), legacy_kmeans)
+    values[i][j] = yValToGridVal(dominant)
+    confidence[i][j] = shareToConfidence(share, values[i][j])
+  return values, confidence
@@ -0,0 +1,115 @@
+import argparse
+import tracemalloc
+import numpy as np
+from crossword_numbering import numberGrid, wordStartsAndEnds
+from crossword_solution import cell_separator
+
+class Puzzle:
+  # one puzzle in a few hundred bytes instead of a (rows, cols, 3) int64
+  # grid and an object array of strings: the black cells as a bitmask, one
+  # clue number per cell (uint8, or uint16 past 255) and the solution as a
+  # single string. to_grid and to_solution_data give back the arrays the
+  # models work on.
+  __slots__ = ('crossword_index', 'rows', 'columns', 'black', 'numbers', 'solution')
+
+  def __init__(self, crossword_index, rows, columns, black, numbers, solution=None):
+    self.crossword_index = crossword_index
+    self.rows = rows
+    self.columns = columns
+    self.black = black
+    self.numbers = numbers
+    # None while nothing has been typed
+    self.solution = solution
+
+  def word_cells(self):
+    bits = np.unpackbits(np.frombuffer(self.black, dtype=np.uint8), count=self.rows * self.columns)
+    return (bits == 0).reshape(self.rows, self.columns)
+
+  def clue_numbers(self):
+    dtype = np.uint8 if len(self.numbers) == self.rows * self.columns else '<u2'
+    return np.frombuffer(self.numbers, dtype=dtype).reshape(self.rows, self.columns)
+
+  def to_grid(self):
+    # the legacy grid: word cell flag, across number and down number
+    white = self.word_cells()
+    numbers = self.clue_numbers()
+    grid = np.zeros((self.rows, self.columns, 3), dtype=int)
+    grid[:, :, 0] = white
+    grid[:, :, 1] = np.where(wordStartsAndEnds(white)[0], numbers, 0)
+    grid[:, :, 2] = np.where(wordStartsAndEnds(white.T)[0].T, numbers, 0)
+    return grid
+
+  def to_solution_data(self):
+    if self.solution is None:
+      return np.full((self.rows, self.columns), '', dtype=object)
+    return np.array(self.solution.split(cell_separator), dtype=object).reshape(self.rows, self.columns)
+
+  def set_solution_data(self, solution_data):
+    self.solution = cell_separator.join(solution_data.flat) if np.any(solution_data != '') else None
+
+def puzzleFromGrid(crossword_index, grid, solution_data=None):
+  # a numbered legacy grid has at most one number per cell, shared by the
+  # across and down words that start there
+  black = np.packbits(grid[:, :, 0] == 0).tobytes()
+  numbers = np.maximum(grid[:, :, 1], grid[:, :, 2])
+  dtype = np.uint8 if numbers.max(initial=0) < 256 else '<u2'
+  puzzle = Puzzle(crossword_index, grid.shape[0], grid.shape[1], black, np.ascontiguousarray(numbers, dtype=dtype).tobytes())
+  if solution_data is not None:
+    puzzle.set_solution_data(solution_data)
+  return puzzle
+
+def randomGrid(rng, shape=(15, 15), black_ratio=0.2):
+  # a point symmetric layout like the real puzzles, numbered
+  black = rng.random(shape) < black_ratio / 2
+  black |= black[::-1, ::-1]
+  grid = np.zeros(shape + (3,), dtype=int)
+  grid[:, :, 0] = ~black
+  numberGrid(grid)
+  return grid
+
+def randomSolution(rng, grid, filled):
+  # every typed cell is its own string, as it is when typed into a model
+  solution_data = np.full(grid.shape[:2], '', dtype=object)
+  letters = [chr(code) for code in range(0x0995, 0x09B9)]
+  for i, j in zip(*np.nonzero(grid[:, :, 0])):
+    if rng.random() < filled:
+      solution_data[i][j] = ''.join([letters[rng.integers(len(letters))], 'া'][:rng.integers(1, 3)])
+  return solution_data
+
+def measure(build):
+  # bytes still allocated by what build returns
+  tracemalloc.start()
+  try:
+    result = build()
+    allocated, _ = tracemalloc.get_traced_memory()
+  finally:
+    tracemalloc.stop()
+  return allocated, result
+
+def legacyPuzzles(puzzles, filled, seed):
+  # (crossword_index, grid, solution_data) as the models hold them
+  rng = np.random.default_rng(seed)
+  samples = []
+  for k in range(puzzles):
+    grid = randomGrid(rng)
+    samples.append((k, grid, randomSolution(rng, grid, filled)))
+  return samples
+
+def runMemoryBenchmark(puzzles=1000, filled=0.5, seed=0):
+  legacy_bytes, legacy = measure(lambda: legacyPuzzles(puzzles, filled, seed))
+  compact_bytes, compact = measure(lambda: [puzzleFromGrid(k, grid, solution) for k, grid, solution in legacy])
+  for (k, grid, solution), puzzle in zip(legacy, compact):
+    assert (puzzle.to_grid() == grid).all() and (puzzle.to_solution_data() == solution).all()
+  return {'puzzles': puzzles, 'legacy_bytes': legacy_bytes, 'compact_bytes': compact_bytes}
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description='Compare the memory of legacy grids and compact puzzles')
+  parser.add_argument('--puzzles', type=int, default=1000, help='random 15x15 puzzles to hold')
+  parser.add_argument('--filled', type=float, default=0.5, help='fraction of word cells with a solution')
+  parser.add_argument('--seed', type=int, default=0)
+  args = parser.parse_args()
+
+  result = runMemoryBenchmark(args.puzzles, args.filled, args.seed)
+  print('{} puzzles: legacy {:.0f} bytes/puzzle, compact {:.0f} bytes/puzzle ({:.1f}x smaller)'.format(
+    result['puzzles'], result['legacy_bytes'] / result['puzzles'], result['compact_bytes'] / result['puzzles'],
+    result['legacy_bytes'] / result['compact_bytes']))
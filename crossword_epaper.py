@@ -0,0 +1,23 @@
+from datetime import date, timedelta
+
+url_format = 'https://epaper.anandabazar.com/epaperimages////{}////{}-md-hr-2ll.png'
+user_agent = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:88.0) Gecko/20100101 Firefox/88.0'
+
+def crosswordIndexForDay(day):
+  return (day - date(2021, 5, 28)).days + 7293
+
+def dayForCrosswordIndex(crossword_index):
+  return date(2021, 5, 28) + timedelta(days=int(crossword_index) - 7293)
+
+def imageUrlForDay(day):
+  dateStr = day.strftime("%d%m%Y")
+  return url_format.format(dateStr, dateStr)
+
+def newSession(pool_size=1):
+  import requests
+  session = requests.Session()
+  session.headers.update({'User-Agent': user_agent})
+  adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+  session.mount('https://', adapter)
+  session.mount('http://', adapter)
+  return session
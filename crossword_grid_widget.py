@@ -0,0 +1,226 @@
+import time
+import unicodedata
+from collections import deque
+from PySide2.QtCore import QRect, QSize, Qt, Signal
+from PySide2.QtGui import QColor, QPainter, QPen
+from PySide2.QtWidgets import QWidget
+from crossword_numbering import across, down
+from crossword_render import cellColor, cellFont, clueIconPixmap
+
+# paint durations kept for paintStats
+paint_history = 200
+# durations of the latest paints of every grid widget of the app
+paint_times = deque(maxlen=paint_history)
+selection_color = QColor(255, 236, 160)
+word_color = QColor(222, 236, 255)
+# the consonant typed after a hasant forms a conjunct with the one before
+# it, and the joiners only change how that conjunct is drawn
+hasant = '\u09cd'
+joiners = '\u200c\u200d'
+
+def continuesCell(cell_text, text):
+  # whether text belongs to the letter already in the cell: a vowel sign or
+  # other combining mark, a joiner, or anything after a hasant
+  return (unicodedata.category(text[0]) in ('Mn', 'Mc') or text[0] in joiners or
+          cell_text.rstrip(joiners).endswith(hasant))
+
+def paintStats():
+  # number of recent paints and their mean and worst duration in milliseconds
+  if not paint_times:
+    return {'paints': 0, 'mean_ms': 0.0, 'max_ms': 0.0}
+  return {
+    'paints': len(paint_times),
+    'mean_ms': 1000 * sum(paint_times) / len(paint_times),
+    'max_ms': 1000 * max(paint_times),
+  }
+
+class CrosswordGridWidget(QWidget):
+  # draws the whole grid straight from grid_data and the model's
+  # solution_data in one paintEvent, and repaints only the cells that change;
+  # word_selected(direction, number) follows the word the selection is in
+  word_selected = Signal(int, int)
+
+  def __init__(self, model, cell_width, cell_height, font_name, font_size, parent=None):
+    QWidget.__init__(self, parent)
+    self.model = model
+    self.cell_width = cell_width
+    self.cell_height = cell_height
+    self.font_name = font_name
+    self.font_size = font_size
+    self.selected = None
+    self.active_word = None
+    self.last_entered = None
+    self.vertical = False
+    self.setFocusPolicy(Qt.StrongFocus)
+    self.setAttribute(Qt.WA_InputMethodEnabled)
+    self.setFixedSize(self.sizeHint())
+    self.model.dataChanged.connect(self.cells_changed)
+    self.model.layoutChanged.connect(self.update)
+    self.model.modelReset.connect(self.update)
+    if len(self.model.words):
+      self.select_word(0)
+
+  def sizeHint(self):
+    shape = self.model.grid_data.shape
+    return QSize(shape[1] * self.cell_width + 1, shape[0] * self.cell_height + 1)
+
+  def cell_rect(self, row, column):
+    return QRect(column * self.cell_width, row * self.cell_height, self.cell_width, self.cell_height)
+
+  def is_word_cell(self, row, column):
+    shape = self.model.grid_data.shape
+    return 0 <= row < shape[0] and 0 <= column < shape[1] and bool(self.model.grid_data[row][column][0])
+
+  def word_rect(self, word):
+    rows, columns = self.model.words.word_span(word)
+    return self.cell_rect(rows.start, columns.start).united(self.cell_rect(rows.stop - 1, columns.stop - 1))
+
+  def select_cell(self, row, column):
+    # selects a cell and the word through it in the current direction, or in
+    # the other one when the cell only has a word that way
+    if row is None or not self.is_word_cell(row, column):
+      return
+    words = self.model.words
+    direction = down if self.vertical else across
+    word = words.word_at(row, column, direction)
+    if word is None:
+      word = words.word_at(row, column, 1 - direction)
+      if word is not None:
+        self.vertical = not self.vertical
+    if self.selected:
+      self.update(self.cell_rect(*self.selected))
+    if self.active_word is not None and word != self.active_word:
+      self.update(self.word_rect(self.active_word))
+    self.selected = (row, column)
+    self.update(self.cell_rect(row, column))
+    if word != self.active_word:
+      self.active_word = word
+      if word is not None:
+        self.update(self.word_rect(word))
+        self.word_selected.emit(*words.clue_of(word))
+
+  def select_word(self, word):
+    self.last_entered = None
+    self.vertical = self.model.words.directions[word] == down
+    self.select_cell(*self.model.words.starts[word])
+
+  def select_clue(self, direction, number):
+    word = self.model.words.word_for_clue(direction, number)
+    if word is not None:
+      self.select_word(word)
+
+  def cells_changed(self, top_left, bottom_right, roles=None):
+    rect = self.cell_rect(top_left.row(), top_left.column()).united(self.cell_rect(bottom_right.row(), bottom_right.column()))
+    self.update(rect)
+
+  def paintEvent(self, event):
+    started = time.perf_counter()
+    grid_data = self.model.grid_data
+    solution_data = self.model.solution_data
+    shape = grid_data.shape
+    rect = event.rect()
+    first_row = max(rect.top() // self.cell_height, 0)
+    last_row = min(rect.bottom() // self.cell_height, shape[0] - 1)
+    first_column = max(rect.left() // self.cell_width, 0)
+    last_column = min(rect.right() // self.cell_width, shape[1] - 1)
+    device_pixel_ratio = self.devicePixelRatioF()
+    cell_words = self.model.words.cell_words
+    if self.active_word is not None:
+      active_direction = self.model.words.directions[self.active_word]
+
+    painter = QPainter(self)
+    painter.setFont(cellFont(self.font_name, self.font_size))
+    painter.setPen(QPen(cellColor(Qt.gray)))
+    for row in range(first_row, last_row + 1):
+      for column in range(first_column, last_column + 1):
+        cell_rect = self.cell_rect(row, column)
+        cell_data = grid_data[row][column]
+        if not cell_data[0]:
+          painter.fillRect(cell_rect, cellColor(Qt.black))
+          continue
+        if (row, column) == self.selected:
+          painter.fillRect(cell_rect, selection_color)
+        elif self.active_word is not None and cell_words[row, column, active_direction] == self.active_word:
+          painter.fillRect(cell_rect, word_color)
+        else:
+          painter.fillRect(cell_rect, cellColor(Qt.white))
+        clue_index = cell_data[1] or cell_data[2]
+        if clue_index:
+          pixmap = clueIconPixmap(clue_index, self.cell_width, self.cell_height, self.font_name, device_pixel_ratio)
+          painter.drawPixmap(cell_rect.topLeft(), pixmap)
+        if solution_data[row][column]:
+          painter.setPen(QPen(cellColor(Qt.black)))
+          painter.drawText(cell_rect, Qt.AlignCenter, solution_data[row][column])
+        painter.setPen(QPen(cellColor(Qt.gray)))
+        painter.drawRect(cell_rect)
+    painter.end()
+    paint_times.append(time.perf_counter() - started)
+
+  def mousePressEvent(self, event):
+    row = event.pos().y() // self.cell_height
+    column = event.pos().x() // self.cell_width
+    if (row, column) == self.selected:
+      self.vertical = not self.vertical
+    self.last_entered = None
+    self.select_cell(row, column)
+
+  def move_selection(self, row_step, column_step):
+    # next word cell in that direction, jumping over black cells
+    if not self.selected:
+      return
+    target = self.model.words.next_cell(*self.selected, (row_step, column_step))
+    if target:
+      self.select_cell(*target)
+
+  def move_word(self, offset):
+    # Tab and Shift+Tab go through the words in clue order
+    words = self.model.words
+    if not len(words):
+      return
+    self.select_word(0 if self.active_word is None else words.next_word(self.active_word, offset))
+
+  def focusNextPrevChild(self, next):
+    # keeps Tab for moving between words
+    return False
+
+  def set_cell_text(self, row, column, text):
+    self.model.setData(self.model.index(row, column), text, Qt.EditRole)
+
+  def enter_text(self, text):
+    if not self.selected or not text:
+      return
+    # the rest of a letter goes into the cell it was started in, which is one
+    # cell behind the selection by now, so that a conjunct such as ক্ষ fills
+    # one cell
+    if self.last_entered:
+      row, column = self.last_entered
+      if continuesCell(self.model.solution_data[row][column], text):
+        self.set_cell_text(row, column, self.model.solution_data[row][column] + text)
+        return
+    self.last_entered = self.selected
+    self.set_cell_text(*self.selected, text)
+    self.move_selection(int(self.vertical), int(not self.vertical))
+
+  def keyPressEvent(self, event):
+    key = event.key()
+    steps = {Qt.Key_Left: (0, -1), Qt.Key_Right: (0, 1), Qt.Key_Up: (-1, 0), Qt.Key_Down: (1, 0)}
+    if key in steps:
+      self.last_entered = None
+      self.vertical = key in (Qt.Key_Up, Qt.Key_Down)
+      self.move_selection(*steps[key])
+    elif key in (Qt.Key_Tab, Qt.Key_Backtab):
+      self.move_word(-1 if key == Qt.Key_Backtab or event.modifiers() & Qt.ShiftModifier else 1)
+    elif key in (Qt.Key_Backspace, Qt.Key_Delete):
+      if self.selected:
+        self.last_entered = None
+        self.set_cell_text(*self.selected, '')
+        if key == Qt.Key_Backspace:
+          self.move_selection(-int(self.vertical), -int(not self.vertical))
+    elif event.text() and event.text().isprintable() and not event.text().isspace():
+      self.enter_text(event.text())
+    else:
+      QWidget.keyPressEvent(self, event)
+
+  def inputMethodEvent(self, event):
+    self.enter_text(event.commitString())
+    event.accept()
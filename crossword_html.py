@@ -0,0 +1,171 @@
+import argparse
+import glob
+import os
+import time
+from html.parser import HTMLParser
+
+image_class = 'crossword-img-1'
+across_class = 'crosswors-across'
+down_class = 'crosswors-down'
+# the parser stops between chunks once everything has been found
+chunk_size = 16384
+
+void_elements = {'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'param', 'source', 'track', 'wbr'}
+
+class CrosswordPageParser(HTMLParser):
+  # picks the crossword image, its h2 header and the two clue divs out of the
+  # page without building a tree; every open element is kept on a stack as
+  # (tag, id) so that the header can be matched to the image's parent
+  def __init__(self):
+    HTMLParser.__init__(self, convert_charrefs=True)
+    self.stack = []
+    self.next_id = 0
+    self.captures = []
+    self.headers = []
+    self.image_parent = None
+    self.image_div = None
+    self.found = {}
+
+  def done(self):
+    return len(self.found) == 4
+
+  def handle_starttag(self, tag, attrs):
+    attrs = dict(attrs)
+    classes = (attrs.get('class') or '').split()
+    if tag == 'img' and self.image_div is not None and 'image_src' not in self.found and self.inside_image_div():
+      self.found['image_src'] = attrs.get('src')
+    if tag in void_elements:
+      return
+    self.next_id += 1
+    if tag == 'div' and image_class in classes and self.image_div is None:
+      # 0 stands for the document itself
+      self.image_parent = self.stack[-1][1] if self.stack else 0
+      self.image_div = self.next_id
+      self.pick_header()
+    elif tag == 'div' and across_class in classes and 'across' not in self.found:
+      self.captures.append((self.next_id, 'across', []))
+    elif tag == 'div' and down_class in classes and 'down' not in self.found:
+      self.captures.append((self.next_id, 'down', []))
+    elif tag == 'h2':
+      self.captures.append((self.next_id, 'h2', []))
+    self.stack.append((tag, self.next_id))
+
+  def inside_image_div(self):
+    return any(element_id == self.image_div for _, element_id in self.stack)
+
+  def handle_endtag(self, tag):
+    if tag in void_elements:
+      return
+    for depth in range(len(self.stack) - 1, -1, -1):
+      if self.stack[depth][0] == tag:
+        break
+    else:
+      return
+    for _, element_id in reversed(self.stack[depth:]):
+      self.close_element(element_id)
+    del self.stack[depth:]
+
+  def close_element(self, element_id):
+    for capture in self.captures:
+      if capture[0] == element_id:
+        self.captures.remove(capture)
+        text = ''.join(capture[2])
+        if capture[1] == 'h2':
+          ancestors = {0} | {ancestor_id for _, ancestor_id in self.stack}
+          self.headers.append((ancestors, text))
+          self.pick_header()
+        else:
+          self.found[capture[1]] = text.strip()
+        break
+
+  def pick_header(self):
+    # the first h2 anywhere below the image's parent, as find('h2') would
+    if 'header' in self.found or self.image_parent is None:
+      return
+    for ancestors, text in self.headers:
+      if self.image_parent in ancestors:
+        self.found['header'] = text.strip()
+        return
+
+  def handle_data(self, data):
+    for capture in self.captures:
+      capture[2].append(data)
+
+def extractCrosswordPage(html):
+  # header, image_src, across and down of a crossword page
+  if isinstance(html, bytes):
+    html = html.decode('utf-8', errors='replace')
+  parser = CrosswordPageParser()
+  for start in range(0, len(html), chunk_size):
+    parser.feed(html[start:start + chunk_size])
+    if parser.done():
+      break
+  else:
+    parser.close()
+  if not parser.done():
+    missing = {'header', 'image_src', 'across', 'down'} - set(parser.found)
+    raise ValueError('crossword page has no {}'.format(', '.join(sorted(missing))))
+  return parser.found
+
+def extractWithBeautifulSoup(html):
+  # the original whole page parse, kept as the benchmark's reference
+  from bs4 import BeautifulSoup
+  soup = BeautifulSoup(html, 'html.parser')
+  img_div = soup.find('div', class_=image_class)
+  return {
+    'header': img_div.parent.find('h2').get_text().strip(),
+    'image_src': img_div.find('img').attrs['src'],
+    'across': soup.find('div', class_=across_class).text.strip(),
+    'down': soup.find('div', class_=down_class).text.strip(),
+  }
+
+def syntheticPage(filler_kb):
+  # a crossword block in the middle of filler articles, like the real page
+  article = '<div class="story"><h2>শিরোনাম</h2><p>{}</p><a href="/x"><img src="//img/x.jpg"></a></div>\n'.format('খবর ' * 60)
+  filler = article * max(1, filler_kb * 1024 // len(article.encode('utf-8')) // 2)
+  crossword = (
+    '<div class="crossword"><h2>শব্দছক ৭৬০৬</h2>'
+    '<div class="crossword-img-1"><img src="//img/crossword-7606.jpg"></div>'
+    '<div class="crosswors-across">১ কলম।<br>২ বই।</div>'
+    '<div class="crosswors-down">৩ গান।<br>৪ &amp; খাতা।</div></div>\n')
+  return '<html><body>' + filler + crossword + filler + '</body></html>'
+
+def benchmarkPage(html, repeat):
+  timings = {}
+  results = {}
+  for name, extract in [('beautifulsoup', extractWithBeautifulSoup), ('targeted', extractCrosswordPage)]:
+    started = time.perf_counter()
+    for _ in range(repeat):
+      results[name] = extract(html)
+    timings[name] = (time.perf_counter() - started) / repeat
+  return timings, results['beautifulsoup'] == results['targeted']
+
+def savedPages(folder='http-cache'):
+  # HTML bodies kept by the HTTP cache
+  pages = []
+  for path in sorted(glob.glob(os.path.join(folder, '*.body'))):
+    with open(path, 'rb') as f:
+      if b'crosswors-across' in f.read():
+        pages.append(path)
+  return pages
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description='Time the crossword page extraction against a full BeautifulSoup parse')
+  parser.add_argument('pages', nargs='*', help='saved crossword pages (default: those in http-cache/)')
+  parser.add_argument('--repeat', type=int, default=20, help='parses of every page per extractor')
+  parser.add_argument('--synthetic-kb', type=int, default=500, help='size of the synthetic page used when there are no saved pages')
+  args = parser.parse_args()
+
+  pages = args.pages or savedPages()
+  sources = []
+  for path in pages:
+    with open(path, 'rb') as f:
+      sources.append((path, f.read()))
+  if not sources:
+    sources.append(('synthetic {} kB'.format(args.synthetic_kb), syntheticPage(args.synthetic_kb).encode('utf-8')))
+
+  for name, html in sources:
+    timings, same = benchmarkPage(html, args.repeat)
+    print('{}: {:.0f} kB, beautifulsoup {:.2f} ms, targeted {:.2f} ms ({:.1f}x){}'.format(
+      name, len(html) / 1024, 1000 * timings['beautifulsoup'], 1000 * timings['targeted'],
+      timings['beautifulsoup'] / timings['targeted'], '' if same else ', RESULTS DIFFER'))
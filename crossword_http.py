@@ -0,0 +1,139 @@
+import glob
+import hashlib
+import json
+import os
+import sys
+
+http_cache_folder = 'http-cache'
+# bodies kept at most; the least recently used ones are dropped first
+max_http_cache_bytes = 256 * 1024 * 1024
+
+def isImage(body):
+  import cv2
+  import numpy as np
+  return cv2.imdecode(np.frombuffer(body, dtype=np.uint8), cv2.IMREAD_GRAYSCALE) is not None
+
+def checkImage(url, response):
+  # the site answers 200 with a page of its own for an image not published
+  # yet, which must not be cached or written as the image
+  content_type = response.headers.get('Content-Type', '')
+  if content_type and not content_type.startswith('image/'):
+    raise IOError('{} is not an image but {}'.format(url, content_type))
+  if not isImage(response.content):
+    raise IOError('{} is not a readable image'.format(url))
+
+class HttpCache:
+  # response bodies and their ETag/Last-Modified validators kept on disk, so
+  # that asking again costs a conditional GET and usually a 304
+  def __init__(self, folder=http_cache_folder, max_bytes=max_http_cache_bytes, offline=False):
+    self.folder = folder
+    self.max_bytes = max_bytes
+    self.offline = offline
+    # what went over the network, for the pipeline metrics
+    self.requests = 0
+    self.received_bytes = 0
+
+  def paths(self, url):
+    key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+    return os.path.join(self.folder, key + '.body'), os.path.join(self.folder, key + '.json')
+
+  def cached(self, url):
+    body_path, meta_path = self.paths(url)
+    try:
+      with open(meta_path, 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+      with open(body_path, 'rb') as f:
+        body = f.read()
+    except (IOError, ValueError):
+      return None, None
+    if meta.get('url') != url or meta.get('size') != len(body):
+      return None, None
+    # the body's modification time orders the entries for eviction
+    os.utime(body_path)
+    return body, meta
+
+  def get(self, session, url, timeout=30, image=False):
+    # returns the body and whether it was 'fetched', 'revalidated' with a
+    # 304 or served 'offline' straight from the cache; with image, a body
+    # that is not one raises IOError instead of being cached
+    body, meta = self.cached(url)
+    if self.offline:
+      if body is None:
+        raise IOError('{} is not in the HTTP cache'.format(url))
+      return body, 'offline'
+    headers = {}
+    if body is not None:
+      if meta.get('etag'):
+        headers['If-None-Match'] = meta['etag']
+      if meta.get('last_modified'):
+        headers['If-Modified-Since'] = meta['last_modified']
+    response = session.get(url, headers=headers, timeout=timeout)
+    self.requests += 1
+    self.received_bytes += len(response.content)
+    if response.status_code == 304 and body is not None:
+      return body, 'revalidated'
+    response.raise_for_status()
+    if image:
+      checkImage(url, response)
+    self.store(url, response)
+    return response.content, 'fetched'
+
+  def store(self, url, response):
+    os.makedirs(self.folder, exist_ok=True)
+    body_path, meta_path = self.paths(url)
+    meta = {
+      'url': url,
+      'etag': response.headers.get('ETag'),
+      'last_modified': response.headers.get('Last-Modified'),
+      'size': len(response.content),
+    }
+    with open(body_path + '.tmp', 'wb') as f:
+      f.write(response.content)
+    os.replace(body_path + '.tmp', body_path)
+    with open(meta_path + '.tmp', 'w', encoding='utf-8') as f:
+      json.dump(meta, f)
+    os.replace(meta_path + '.tmp', meta_path)
+    self.evict(body_path)
+
+  def evict(self, keep=None):
+    entries = []
+    for body_path in glob.glob(os.path.join(self.folder, '*.body')):
+      status = os.stat(body_path)
+      entries.append((status.st_mtime, status.st_size, body_path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, body_path in sorted(entries):
+      if total <= self.max_bytes:
+        break
+      if body_path == keep:
+        continue
+      os.unlink(body_path)
+      meta_path = body_path[:-len('.body')] + '.json'
+      if os.path.isfile(meta_path):
+        os.unlink(meta_path)
+      total -= size
+
+http_cache = None
+
+def httpCache():
+  # shared cache of the app; --offline on the command line serves only what
+  # is already cached
+  global http_cache
+  if http_cache is None:
+    http_cache = HttpCache(offline='--offline' in sys.argv[1:])
+  return http_cache
+
+def downloadFile(session, url, filename, timeout=30):
+  # keeps the image filename in step with the cached body and returns how
+  # it was got; an existing file is kept as it is when the site cannot be
+  # reached or has not published the image
+  try:
+    body, status = httpCache().get(session, url, timeout, image=True)
+  except IOError:
+    if os.path.isfile(filename):
+      return 'stale'
+    raise
+  if status == 'fetched' or not os.path.isfile(filename):
+    with open(filename + '.part', 'wb') as f:
+      f.write(body)
+    os.replace(filename + '.part', filename)
+  return status
@@ -0,0 +1,60 @@
+import os
+import bangla
+from PySide2.QtCore import QByteArray, QRect, Qt
+from PySide2.QtGui import QPainter, QPixmap
+from PySide2.QtSvg import QSvgRenderer
+
+icon_cache_folder = 'icon-cache'
+# icons up to this clue number are rendered together and kept on disk
+cached_icon_count = 99
+
+def clueIconSvg(clue_index, icon_width, icon_height, font_name):
+  font_height = icon_height // 3
+  code = r'<?xml version="1.0" encoding="UTF-8"?>' + '\n'
+  code += r'<svg width="{}" height="{}" xmlns="http://www.w3.org/2000/svg">'.format(icon_width, icon_height) + '\n'
+  code += r'<text x="0" y="{}" font-family="{}" font-size="{}px">'.format(font_height, font_name, font_height) + bangla.convert_english_digit_to_bangla_digit(str(clue_index)) + r'</text>' + '\n'
+  code += r'</svg>'
+  return code.encode('utf-8')
+
+def renderClueIcon(painter, clue_index, rect, font_name):
+  renderer = QSvgRenderer(QByteArray(clueIconSvg(clue_index, rect.width(), rect.height(), font_name)))
+  renderer.render(painter, rect)
+
+def iconAtlasPath(icon_width, icon_height, font_name):
+  return os.path.join(icon_cache_folder, 'clue-icons-{}-{}x{}.png'.format(font_name, icon_width, icon_height))
+
+def renderIconAtlas(icon_width, icon_height, font_name):
+  atlas = QPixmap(icon_width * cached_icon_count, icon_height)
+  atlas.fill(Qt.transparent)
+  painter = QPainter(atlas)
+  for k in range(cached_icon_count):
+    renderClueIcon(painter, k + 1, QRect(k * icon_width, 0, icon_width, icon_height), font_name)
+  painter.end()
+  return atlas
+
+def clueIconAtlas(icon_width, icon_height, font_name):
+  # all cached icons of one size and font side by side, read from the atlas
+  # written by an earlier run or rendered and written now
+  atlas_path = iconAtlasPath(icon_width, icon_height, font_name)
+  atlas = QPixmap(atlas_path)
+  if atlas.width() != icon_width * cached_icon_count or atlas.height() != icon_height:
+    atlas = renderIconAtlas(icon_width, icon_height, font_name)
+    os.makedirs(icon_cache_folder, exist_ok=True)
+    temp_path = '{}.{}.tmp.png'.format(atlas_path, os.getpid())
+    if atlas.save(temp_path, 'PNG'):
+      os.replace(temp_path, atlas_path)
+  return atlas
+
+def clueIcon(clue_index, pixel_width, pixel_height, font_name, device_pixel_ratio=1.0, atlas=None):
+  # one icon in device pixels, copied out of the atlas when it covers the
+  # clue number and rendered otherwise
+  if atlas is not None and 1 <= clue_index <= cached_icon_count:
+    pixmap = atlas.copy((clue_index - 1) * pixel_width, 0, pixel_width, pixel_height)
+  else:
+    pixmap = QPixmap(pixel_width, pixel_height)
+    pixmap.fill(Qt.transparent)
+    painter = QPainter(pixmap)
+    renderClueIcon(painter, clue_index, pixmap.rect(), font_name)
+    painter.end()
+  pixmap.setDevicePixelRatio(device_pixel_ratio)
+  return pixmap
@@ -0,0 +1,87 @@
+from PySide2.QtCore import QCoreApplication, QThread, Signal
+from PySide2.QtWidgets import QHBoxLayout, QLabel, QProgressBar, QPushButton, QWidget
+
+class PuzzleLoadThread(QThread):
+  # runs load(progress, cancelled) away from the UI thread; load reports
+  # progress as (message, percent), checks cancelled() between its stages
+  # and returns the new puzzle, or None once it has been cancelled
+  progress = Signal(str, int)
+  loaded = Signal(object)
+  failed = Signal(str)
+
+  def __init__(self, load, parent=None):
+    QThread.__init__(self, parent)
+    self.load = load
+
+  def run(self):
+    try:
+      result = self.load(self.progress.emit, self.isInterruptionRequested)
+    except Exception as e:
+      self.failed.emit('{}: {}'.format(type(e).__name__, e))
+      return
+    if result is not None and not self.isInterruptionRequested():
+      self.loaded.emit(result)
+
+  def cancel(self):
+    self.requestInterruption()
+
+class LoadProgressWidget(QWidget):
+  # one line with the current stage, a progress bar and a cancel button,
+  # shown while a PuzzleLoadThread runs
+  def __init__(self, parent=None):
+    QWidget.__init__(self, parent)
+    self.load_thread = None
+    self.label = QLabel(self)
+    self.bar = QProgressBar(self)
+    self.bar.setRange(0, 100)
+    self.cancel_button = QPushButton('Cancel', self)
+    self.cancel_button.clicked.connect(self.cancel)
+    layout = QHBoxLayout(self)
+    layout.setContentsMargins(0, 0, 0, 0)
+    layout.addWidget(self.label)
+    layout.addWidget(self.bar)
+    layout.addWidget(self.cancel_button)
+    self.setLayout(layout)
+    self.hide()
+    QCoreApplication.instance().aboutToQuit.connect(self.stop)
+
+  def start(self, load, loaded):
+    # loaded should be a method of a QObject on the UI thread, so that the
+    # new puzzle is handed over through the event loop
+    self.stop()
+    self.load_thread = PuzzleLoadThread(load, self)
+    self.load_thread.loaded.connect(loaded)
+    self.load_thread.progress.connect(self.show_progress)
+    self.load_thread.failed.connect(self.show_failure)
+    self.load_thread.finished.connect(self.finish)
+    self.bar.show()
+    self.cancel_button.show()
+    self.cancel_button.setEnabled(True)
+    self.show_progress('Starting', 0)
+    self.load_thread.start()
+
+  def stop(self):
+    if self.load_thread and self.load_thread.isRunning():
+      self.load_thread.cancel()
+      self.load_thread.wait()
+
+  def show_progress(self, message, percent):
+    self.label.setText(message)
+    self.bar.setValue(percent)
+    self.show()
+
+  def show_failure(self, message):
+    self.label.setText('Could not load the new puzzle: {}'.format(message))
+    self.bar.hide()
+    self.cancel_button.hide()
+
+  def cancel(self):
+    if self.load_thread:
+      self.load_thread.cancel()
+    self.label.setText('Cancelling')
+    self.cancel_button.setEnabled(False)
+
+  def finish(self):
+    # failures stay on screen, everything else goes away
+    if not self.bar.isHidden():
+      self.hide()
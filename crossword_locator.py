@@ -0,0 +1,168 @@
+import hashlib
+import json
+import os
+import numpy as np
+from crossword_cache import grid_cache_folder
+
+# pixels darker than this count as ink
+dark_threshold = 128
+# a grid line must be darker than the rows/columns this far on either side
+peak_width = 4
+# a peak this fraction of the strongest one is still taken for a line
+min_peak_score = 0.3
+# gaps between neighbouring lines may differ this much from the spacing
+spacing_tolerance = 0.2
+# most lines that may be missing in a row, e.g. between rows of black cells
+max_missing_lines = 2
+# smallest cell, in pixels, that is taken for a grid
+min_cell_size = 8
+# fraction of a cached line that must still be ink for the cache to be used
+min_line_darkness = 0.6
+# bump whenever a change to the locator can move the lines it finds
+locator_version = 1
+
+location_cache_file = os.path.join(grid_cache_folder, 'grid-location.json')
+cached_locations = {}
+
+def projectionLines(profile):
+  # (start, end) of every narrow peak of an ink projection
+  padded = np.pad(profile, peak_width, mode='edge')
+  score = profile - np.maximum(padded[:-2 * peak_width], padded[2 * peak_width:])
+  if score.max() <= 0:
+    return []
+  candidates = np.flatnonzero(score > score.max() * min_peak_score)
+  runs = np.split(candidates, np.flatnonzero(np.diff(candidates) > 1) + 1)
+  return [(int(run[0]), int(run[-1])) for run in runs]
+
+def evenlySpacedLines(lines):
+  # longest run of lines spaced a whole number of cells apart; lines missed
+  # between two found ones are interpolated
+  if len(lines) < 3:
+    return None
+  centers = np.array([(start + end) / 2 for start, end in lines])
+  gaps = np.diff(centers)
+  spacing = np.median(gaps)
+  if spacing < min_cell_size:
+    return None
+
+  best, chain = [], [0]
+  for k, gap in enumerate(gaps):
+    steps = round(gap / spacing)
+    if 1 <= steps <= max_missing_lines + 1 and abs(gap - steps * spacing) <= spacing_tolerance * spacing:
+      chain.append(k + 1)
+    else:
+      best, chain = max(best, chain, key=len), [k + 1]
+  best = max(best, chain, key=len)
+  if len(best) < 2:
+    return None
+
+  spaced = [lines[best[0]]]
+  for a, b in zip(best, best[1:]):
+    steps = round((centers[b] - centers[a]) / spacing)
+    for step in range(1, steps):
+      middle = int(round(centers[a] + (centers[b] - centers[a]) * step / steps))
+      spaced.append((middle, middle))
+    spaced.append(lines[b])
+  return spaced
+
+def locateGridLines(image_gray):
+  dark = image_gray < dark_threshold
+  row_lines = evenlySpacedLines(projectionLines(dark.mean(axis=1)))
+  column_lines = evenlySpacedLines(projectionLines(dark.mean(axis=0)))
+  if row_lines is None or column_lines is None:
+    return None
+
+  # second pass with each projection limited to the box found by the first,
+  # so that text beside the grid does not dilute the grid lines
+  top, bottom = row_lines[0][0], row_lines[-1][1] + 1
+  left, right = column_lines[0][0], column_lines[-1][1] + 1
+  row_lines = evenlySpacedLines(projectionLines(dark[:, left:right].mean(axis=1)))
+  column_lines = evenlySpacedLines(projectionLines(dark[top:bottom, :].mean(axis=0)))
+  if row_lines is None or column_lines is None:
+    return None
+  return row_lines, column_lines
+
+def linesToBounds(lines):
+  # cells lie strictly between two lines, leaving out a pixel of antialiasing
+  starts = np.array([end + 2 for _, end in lines[:-1]])
+  ends = np.array([start - 1 for start, _ in lines[1:]])
+  return starts, np.maximum(ends, starts + 1)
+
+def gridLinesToBounds(grid_lines):
+  row_lines, column_lines = grid_lines
+  return linesToBounds(row_lines) + linesToBounds(column_lines)
+
+def gridLinesMatchImage(image_gray, grid_lines):
+  row_lines, column_lines = grid_lines
+  dark = image_gray < dark_threshold
+  top, bottom = row_lines[0][0], row_lines[-1][1] + 1
+  left, right = column_lines[0][0], column_lines[-1][1] + 1
+  if bottom > dark.shape[0] or right > dark.shape[1]:
+    return False
+  row_darkness = dark[:, left:right].mean(axis=1)
+  column_darkness = dark[top:bottom, :].mean(axis=0)
+  for lines, darkness in ((row_lines, row_darkness), (column_lines, column_darkness)):
+    for start, end in lines:
+      if darkness[max(start - 1, 0):end + 2].max() < min_line_darkness:
+        return False
+    # a grid that grew by a row or column keeps all the old lines
+    spacing = lines[1][0] - lines[0][0]
+    for position in (lines[0][0] - spacing, lines[-1][1] + spacing):
+      if 0 < position < len(darkness) - 1 and darkness[position - 1:position + 2].max() >= min_line_darkness:
+        return False
+  return True
+
+def locatorSettings():
+  # everything besides the page that the located lines depend on
+  return {
+    'locator_version': locator_version,
+    'dark_threshold': dark_threshold,
+    'peak_width': peak_width,
+    'min_peak_score': min_peak_score,
+    'spacing_tolerance': spacing_tolerance,
+    'max_missing_lines': max_missing_lines,
+    'min_cell_size': min_cell_size,
+    'min_line_darkness': min_line_darkness,
+  }
+
+def locationKey(shape):
+  # lines found by another version or with other settings are never reused
+  settings = json.dumps(locatorSettings(), sort_keys=True).encode('utf-8')
+  return '{}x{}-{}'.format(shape[0], shape[1], hashlib.sha256(settings).hexdigest()[:16])
+
+def loadLocationCache():
+  try:
+    with open(location_cache_file, encoding='utf-8') as f:
+      return json.load(f)
+  except (IOError, ValueError):
+    return {}
+
+def storeLocationCache(key, grid_lines):
+  locations = loadLocationCache()
+  locations[key] = grid_lines
+  os.makedirs(grid_cache_folder, exist_ok=True)
+  temp_file = '{}.{}.tmp'.format(location_cache_file, os.getpid())
+  with open(temp_file, 'w', encoding='utf-8') as f:
+    json.dump(locations, f)
+  os.replace(temp_file, location_cache_file)
+
+def locateGrid(image_gray):
+  # (ystarts, yends, xstarts, xends) of the cells of the grid found on the
+  # page, or None. The lines found for a page size are reused for later pages
+  # of the same size as long as they still lie on grid lines, so the layout
+  # is only searched for when it changes.
+  key = locationKey(image_gray.shape)
+  if key not in cached_locations:
+    cached_location = loadLocationCache().get(key)
+    if cached_location:
+      cached_locations[key] = tuple([tuple(line) for line in lines] for lines in cached_location)
+  grid_lines = cached_locations.get(key)
+  if grid_lines is not None and gridLinesMatchImage(image_gray, grid_lines):
+    return gridLinesToBounds(grid_lines)
+
+  grid_lines = locateGridLines(image_gray)
+  if grid_lines is None:
+    return None
+  cached_locations[key] = grid_lines
+  storeLocationCache(key, grid_lines)
+  return gridLinesToBounds(grid_lines)
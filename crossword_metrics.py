@@ -0,0 +1,111 @@
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+class RunMetrics:
+  # seconds spent in every stage and counters of one run, written as one
+  # record once the run is over
+  def __init__(self, kind, source):
+    self.kind = kind
+    self.source = source
+    self.started = time.time()
+    self.crossword_index = None
+    self.outcome = None
+    self.seconds = {}
+    self.counters = {}
+
+  def timed(self, stage, function, *args):
+    started = time.perf_counter()
+    try:
+      return function(*args)
+    finally:
+      self.seconds[stage] = self.seconds.get(stage, 0) + time.perf_counter() - started
+
+  def count(self, name, value=1):
+    self.counters[name] = self.counters.get(name, 0) + value
+
+  def record(self):
+    return {
+      'time': datetime.fromtimestamp(self.started).isoformat(timespec='seconds'),
+      'timestamp': self.started,
+      'kind': self.kind,
+      'source': self.source,
+      'crossword_index': self.crossword_index,
+      'outcome': self.outcome,
+      'seconds': self.seconds,
+      'counters': self.counters,
+    }
+
+def commandLineValue(option, argv=None):
+  # the value following option in the arguments of a frontend, or None
+  argv = sys.argv[1:] if argv is None else argv
+  if option in argv[:-1]:
+    return argv[argv.index(option) + 1]
+  return None
+
+def appendJsonLines(path, record):
+  # one line per run; a single write so that runs of several processes
+  # never interleave within a line
+  line = json.dumps(record, ensure_ascii=False) + '\n'
+  with open(path, 'a', encoding='utf-8') as f:
+    f.write(line)
+
+def prometheusLabels(labels):
+  return ','.join('{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"')) for name, value in labels)
+
+def prometheusText(records):
+  # gauges of the latest run of every kind and source
+  metrics = {}
+  def add(name, help_text, labels, value):
+    metrics.setdefault(name, (help_text, []))[1].append('{}{{{}}} {}'.format(name, prometheusLabels(labels), value))
+  for record in records:
+    labels = [('kind', record['kind']), ('source', record['source'])]
+    add('crossword_last_run_timestamp_seconds', 'Start of the last run', labels, record['timestamp'])
+    add('crossword_last_run_ok', '1 if the last run finished with a puzzle', labels, int(record['outcome'] == 'ok'))
+    for stage, seconds in sorted(record['seconds'].items()):
+      add('crossword_stage_seconds', 'Seconds spent in each stage of the last run', labels + [('stage', stage)], seconds)
+    for name, value in sorted(record['counters'].items()):
+      add('crossword_{}'.format(name), 'Counter of the last run', labels, value)
+  lines = []
+  for name, (help_text, samples) in sorted(metrics.items()):
+    lines.append('# HELP {} {}'.format(name, help_text))
+    lines.append('# TYPE {} gauge'.format(name))
+    lines += samples
+  return '\n'.join(lines) + '\n'
+
+def writePrometheus(path, record):
+  # the text file collector wants the whole file replaced, so the latest
+  # record of every kind and source is kept next to it
+  latest_path = path + '.json'
+  try:
+    with open(latest_path, 'r', encoding='utf-8') as f:
+      latest = json.load(f)
+  except (IOError, ValueError):
+    latest = {}
+  latest['{}/{}'.format(record['kind'], record['source'])] = record
+  for target, text in [(latest_path, json.dumps(latest, ensure_ascii=False)), (path, prometheusText(latest.values()))]:
+    with open(target + '.tmp', 'w', encoding='utf-8') as f:
+      f.write(text)
+    os.replace(target + '.tmp', target)
+
+def writeMetrics(path, record):
+  # Prometheus text for .prom files, JSON lines otherwise
+  if path.endswith('.prom'):
+    writePrometheus(path, record)
+  else:
+    appendJsonLines(path, record)
+
+def profiled(profile_file, function, *args):
+  # runs function under cProfile and dumps the stats for pstats/snakeviz
+  if not profile_file:
+    return function(*args)
+  import cProfile
+  profiler = cProfile.Profile()
+  profiler.enable()
+  try:
+    return function(*args)
+  finally:
+    profiler.disable()
+    profiler.dump_stats(profile_file)
@@ -0,0 +1,158 @@
+import numpy as np
+from PySide2.QtCore import Qt, QAbstractTableModel, QModelIndex
+from crossword_autosave import SolutionAutosaver
+from crossword_numbering import WordIndex
+from crossword_solution import changedBounds, readSolution, solutionPath
+from crossword_store import puzzleStore
+from crossword_render import cellColor, cellFont, clueBrush
+
+grid_cell_size = 30
+font_name = 'Kalpurush'
+font_size = 14
+
+def ignoreMessage(message):
+  pass
+
+class CrosswordGridModel(QAbstractTableModel):
+  # the grid and the solution typed into it; source is the name of the
+  # pipeline the puzzle came from. notify(message) tells the user how
+  # saving, loading and clearing went, the way the frontend shows it
+  def __init__(self, source, crossword_index, grid_data, notify=ignoreMessage, parent=None, store=None):
+    QAbstractTableModel.__init__(self, parent)
+    self.source = source
+    self.crossword_index = crossword_index
+    self.notify = notify
+    self.store = store or puzzleStore()
+    self.load_grid_data(grid_data)
+    shape = grid_data.shape
+    self.solution_data = np.full((shape[0], shape[1]), '', dtype=object)
+    self.icon_size = (grid_cell_size, grid_cell_size)
+    self.autosave = SolutionAutosaver(self)
+    self.autosave.saved.connect(self.solution_saved, Qt.QueuedConnection)
+    self.autosave.failed.connect(self.save_failed, Qt.QueuedConnection)
+
+  def clear_solution(self):
+    changed = self.solution_data != ''
+    self.autosave.mark_dirty(zip(*np.nonzero(changed)))
+    self.solution_data.fill('')
+    self.cells_changed(changed)
+    self.notify('Solution cleared')
+
+  def save_solution(self):
+    if not np.any(self.solution_data):
+      self.notify('Nothing to save')
+      return False
+    # 'Solution saved' follows once the writer thread has written it
+    self.autosave.save(force=True, requested=True)
+    return True
+
+  def solution_saved(self, requested):
+    if requested:
+      self.notify('Solution saved')
+
+  def save_failed(self, message):
+    self.notify(message)
+
+  def close(self):
+    # the frontends call this before they drop the model
+    self.autosave.close()
+
+  def load_solution(self):
+    try:
+      solution, legacy = self.read_solution()
+    except IOError:
+      self.notify('No saved solution')
+      return
+    except ValueError:
+      self.notify('Saved solution does not match this grid')
+      return
+    changed = self.solution_data != solution
+    self.solution_data[:] = solution
+    self.autosave.mark_clean()
+    if legacy:
+      # moves solution files from before the store into it
+      self.autosave.save(force=True)
+    self.cells_changed(changed)
+    self.notify('Solution loaded')
+
+  def read_solution(self):
+    # the solution and whether it came from a solution-<index>.txt file
+    if self.crossword_index is None:
+      raise IOError('no puzzle')
+    try:
+      return self.store.read_solution(self.source, self.crossword_index, self.grid_data), False
+    except IOError:
+      return readSolution(solutionPath(self.crossword_index), self.grid_data), True
+
+  def cells_changed(self, changed):
+    # one dataChanged covering every cell set in the boolean mask
+    bounds = changedBounds(changed)
+    if bounds:
+      top, left, bottom, right = bounds
+      self.dataChanged.emit(self.index(top, left), self.index(bottom, right), [Qt.DisplayRole, Qt.EditRole])
+
+  def load_grid_data(self, grid_data):
+    self.grid_data = grid_data
+    self.words = WordIndex(grid_data)
+    shape = grid_data.shape
+    self.row_count = shape[0]
+    self.column_count = shape[1]
+
+  def rowCount(self, parent=QModelIndex()):
+    return self.row_count
+
+  def columnCount(self, parent=QModelIndex()):
+    return self.column_count
+
+  def headerData(self, section, orientation, role):
+    return None
+
+  def flags(self, index):
+    row = index.row()
+    column = index.column()
+    is_word_cell = self.grid_data[row][column][0]
+    if is_word_cell:
+      return Qt.ItemIsEnabled | Qt.ItemIsEditable
+    return Qt.ItemIsEnabled
+
+  def data(self, index, role=Qt.DisplayRole):
+    row = index.row()
+    column = index.column()
+    cell_data = self.grid_data[row][column]
+    is_word_cell = cell_data[0]
+    clue_index = cell_data[1] or cell_data[2]
+
+    if role == Qt.DisplayRole:
+      return self.solution_data[row][column]
+    if role == Qt.EditRole:
+      return self.solution_data[row][column]
+    elif role == Qt.BackgroundRole:
+      if is_word_cell:
+        if clue_index:
+          return clueBrush(clue_index, self.icon_size[0], self.icon_size[1], font_name)
+        else:
+          return cellColor(Qt.white)
+      else:
+        return cellColor(Qt.black)
+    elif role == Qt.FontRole:
+      font = cellFont(font_name, font_size)
+      return font
+    elif role == Qt.TextAlignmentRole:
+      return Qt.AlignCenter
+    return None
+
+  def setData(self, index, value, role=Qt.EditRole):
+    row = index.row()
+    column = index.column()
+    if role == Qt.EditRole:
+      if self.solution_data[row][column] != value:
+        self.solution_data[row][column] = value
+        self.autosave.mark_dirty([(row, column)])
+        self.dataChanged.emit(index, index, [Qt.DisplayRole, Qt.EditRole])
+      return True
+    elif role == Qt.FontRole:
+      font = cellFont(font_name, font_size)
+      return font
+    elif role == Qt.TextAlignmentRole:
+      return Qt.AlignCenter
+    return False
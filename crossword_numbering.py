@@ -0,0 +1,126 @@
+import numpy as np
+
+across = 0
+down = 1
+
+def wordStartsAndEnds(white):
+  # cells that start and end a word of two or more cells along axis 1
+  before = np.zeros_like(white)
+  before[:, 1:] = white[:, :-1]
+  after = np.zeros_like(white)
+  after[:, :-1] = white[:, 1:]
+  return white & ~before & after, white & before & ~after
+
+def wordSlots(white, numbers, direction):
+  # starts and ends pair up when both are taken in reading order along the
+  # direction of the words
+  cells = white if direction == across else white.T
+  starts, ends = wordStartsAndEnds(cells)
+  start_rows, start_columns = np.nonzero(starts)
+  end_columns = np.nonzero(ends)[1]
+  lengths = end_columns - start_columns + 1
+  if direction == down:
+    start_rows, start_columns = start_columns, start_rows
+  slot_starts = np.stack([start_rows, start_columns], axis=1)
+  slot_numbers = numbers[start_rows, start_columns]
+  order = np.argsort(slot_numbers, kind='stable')
+  return slot_starts[order], lengths[order], slot_numbers[order]
+
+def numberGrid(grid):
+  # fills in the across (grid[:, :, 1]) and down (grid[:, :, 2]) clue numbers
+  # of a grid whose grid[:, :, 0] marks the word cells, and returns the word
+  # slots as (starts, directions, lengths, numbers) arrays
+  white = grid[:, :, 0].astype(bool)
+  across_starts = wordStartsAndEnds(white)[0]
+  down_starts = wordStartsAndEnds(white.T)[0].T
+  starts = across_starts | down_starts
+  numbers = np.cumsum(starts).reshape(starts.shape) * starts
+  grid[:, :, 1] = np.where(across_starts, numbers, 0)
+  grid[:, :, 2] = np.where(down_starts, numbers, 0)
+
+  across_slots = wordSlots(white, numbers, across)
+  down_slots = wordSlots(white, numbers, down)
+  slot_starts = np.concatenate([across_slots[0], down_slots[0]])
+  directions = np.repeat([across, down], [len(across_slots[0]), len(down_slots[0])])
+  lengths = np.concatenate([across_slots[1], down_slots[1]])
+  slot_numbers = np.concatenate([across_slots[2], down_slots[2]])
+  return slot_starts, directions, lengths, slot_numbers
+
+def nextWordCells(white, step):
+  # for every cell, the nearest word cell step = (row_step, column_step)
+  # away, jumping over black cells, as a (rows, cols, 2) array; -1 past the
+  # edge of the grid
+  rows, columns = white.shape
+  targets = np.full((rows, columns, 2), -1, dtype=int)
+  row_step, column_step = step
+  row_order = range(rows - 1, -1, -1) if row_step > 0 else range(rows)
+  column_order = range(columns - 1, -1, -1) if column_step > 0 else range(columns)
+  for row in row_order:
+    for column in column_order:
+      neighbour = (row + row_step, column + column_step)
+      if not (0 <= neighbour[0] < rows and 0 <= neighbour[1] < columns):
+        continue
+      targets[row, column] = neighbour if white[neighbour] else targets[neighbour]
+  return targets
+
+class WordIndex:
+  # which words every cell belongs to, built once per puzzle so that the
+  # grid widget can highlight and move between words without scanning the
+  # grid: words are numbered across first, then down, each in clue number
+  # order, as numberGrid returns its slots
+  steps = [(0, -1), (0, 1), (-1, 0), (1, 0)]
+
+  def __init__(self, grid):
+    white = grid[:, :, 0].astype(bool)
+    numbers = np.maximum(grid[:, :, 1], grid[:, :, 2])
+    slots = [wordSlots(white, numbers, direction) for direction in (across, down)]
+    self.starts = np.concatenate([slot[0] for slot in slots]).reshape(-1, 2)
+    self.directions = np.repeat([across, down], [len(slots[0][0]), len(slots[1][0])])
+    self.lengths = np.concatenate([slot[1] for slot in slots])
+    self.numbers = np.concatenate([slot[2] for slot in slots])
+    # cell -> (across word, down word), -1 where there is none
+    self.cell_words = np.full(white.shape + (2,), -1, dtype=int)
+    for word in range(len(self.starts)):
+      rows, columns = self.word_span(word)
+      self.cell_words[rows, columns, self.directions[word]] = word
+    self.number_words = {(int(direction), int(number)): word
+                         for word, (direction, number) in enumerate(zip(self.directions, self.numbers))}
+    self.next_cells = {step: nextWordCells(white, step) for step in self.steps}
+
+  def __len__(self):
+    return len(self.starts)
+
+  def word_span(self, word):
+    # row and column slices of the cells of a word
+    row, column = self.starts[word]
+    length = self.lengths[word]
+    if self.directions[word] == across:
+      return slice(row, row + 1), slice(column, column + length)
+    return slice(row, row + length), slice(column, column + 1)
+
+  def word_cells(self, word):
+    rows, columns = self.word_span(word)
+    return [(row, column) for row in range(rows.start, rows.stop) for column in range(columns.start, columns.stop)]
+
+  def word_at(self, row, column, direction):
+    # the word through a cell in that direction, or None
+    word = self.cell_words[row, column, direction]
+    return None if word < 0 else int(word)
+
+  def word_for_clue(self, direction, number):
+    return self.number_words.get((direction, int(number)))
+
+  def clue_of(self, word):
+    return int(self.directions[word]), int(self.numbers[word])
+
+  def next_cell(self, row, column, step):
+    # the nearest word cell in that direction, or None at the edge
+    target = self.next_cells[step][row, column]
+    return None if target[0] < 0 else (int(target[0]), int(target[1]))
+
+  def next_word(self, word, offset=1):
+    # the word offset places further on, wrapping around; a grid without
+    # words has nowhere else to go
+    if not len(self.starts):
+      return word
+    return (word + offset) % len(self.starts)
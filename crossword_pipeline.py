@@ -0,0 +1,433 @@
+import datetime
+import os
+import time
+from abc import ABC, abstractmethod
+import numpy as np
+import bangla
+from crossword_classifier import cellBounds, classifyGridCells, equalCellBounds, min_confidence
+from crossword_locator import locateGrid
+from crossword_numbering import numberGrid
+from crossword_cache import detectorSettings, loadCachedGrid, storeCachedGrid
+from crossword_epaper import crosswordIndexForDay, dayForCrosswordIndex, imageUrlForDay, newSession
+from crossword_http import downloadFile, httpCache
+from crossword_html import extractCrosswordPage
+from crossword_metrics import RunMetrics, profiled, writeMetrics
+
+# the stages of a pipeline, in the order they run; any of them can be
+# replaced per instance, e.g. EpaperPipeline(classify=myClassifier)
+stage_names = ('fetch', 'decode', 'locate', 'classify', 'number', 'clues', 'export')
+# the stages whose output is the detected grid
+detection_stages = ('decode', 'locate', 'classify', 'number')
+
+default_grid_shape = (15, 15)
+
+# seconds before a download is given up, so that quitting never waits long
+fetch_timeout = 30
+
+# where the grid and the clue boxes are on an epaper page
+grid_left = 30
+grid_right = 512
+grid_top = 202
+grid_bottom = 701
+
+right_clues_left = 516
+right_clues_right = 760
+right_clues_top = 190
+right_clues_bottom = 524
+
+down_clues_left = 24
+down_clues_right = 516
+down_clues_top = 705
+down_clues_bottom = 808
+
+crossword_url = 'https://www.anandabazar.com/others/crossword'
+
+def ignoreProgress(message, percent):
+  pass
+
+def neverCancelled():
+  return False
+
+def cellValue(y_val, y_min, y_max):
+  # 0 for a black cell, 1 for a word cell and -1 when the intensity is in
+  # neither the darkest nor the brightest fifth
+  y_min_max = y_min + (y_max - y_min) / 5 # max of y_min
+  y_max_min = y_max - (y_max - y_min) / 5 # min of y_max
+  return 0 if y_val < y_min_max else 1 if y_val > y_max_min else -1
+
+english_digit_by_bangla_digit = {k : v for k, v in zip(bangla.bangla_number, bangla.english_number)}
+def convertBanglaDigitsToEnglishDigits(number):
+  for b, e in english_digit_by_bangla_digit.items():
+    number = number.replace(b, e)
+  return number
+
+def readClueFile(filename):
+  clues = []
+  with open(filename, encoding='utf-8', mode='r') as f:
+    for line in f.readlines():
+      number, clue = line.strip().split(' ', 1)
+      number = convertBanglaDigitsToEnglishDigits(number)
+      clues.append((number, clue[:-1]))
+  return sorted(clues, key=lambda item: int(item[0]))
+
+def readPuzzleClues(crossword_index, folder='.'):
+  # across and down clues as (number, clue) pairs in clue number order
+  across = readClueFile(os.path.join(folder, 'horizontal-clues-{}.txt'.format(crossword_index)))
+  down = readClueFile(os.path.join(folder, 'vertical-clues-{}.txt'.format(crossword_index)))
+  return across, down
+
+def applyGridStyles(grid, puzzle):
+  for i, j in zip(*np.nonzero(grid[:, :, 0] == 0)):
+    puzzle[i, j].style = {'background-color': 'black'}
+
+def populatePuzzleClues(crossword_index, puzzle, folder='.'):
+  across, down = readPuzzleClues(crossword_index, folder)
+  for number, clue in across:
+    puzzle.clues.across[number] = clue
+  for number, clue in down:
+    puzzle.clues.down[number] = clue
+
+def buildPuzzle(grid, crossword_index, folder='.'):
+  # the crossword package is only needed for export
+  import crossword
+  puzzle = crossword.Crossword(grid.shape[0], grid.shape[1])
+  puzzle.meta.kind = 'http://ipuz.org/crossword#1'
+  applyGridStyles(grid, puzzle)
+  populatePuzzleClues(crossword_index, puzzle, folder)
+  return puzzle
+
+def writeIpuzFile(puzzle, filename):
+  import crossword
+  import ipuz
+  ipuz_dict = crossword.to_ipuz(puzzle)
+  with open(filename, 'w') as f:
+    f.write(ipuz.write(ipuz_dict))
+
+def stageName(stage):
+  # names a replaced stage in the grid cache key
+  return '{}.{}'.format(getattr(stage, '__module__', None), getattr(stage, '__qualname__', type(stage).__name__))
+
+class Pipeline(ABC):
+  # fetch, decode, locate, classify, number, clues and export for one puzzle
+  # source. The detected grid is kept in the grid cache, keyed by the image
+  # and by everything that can change the detection, and fetched files go
+  # through the HTTP cache, so running the pipeline again is cheap. Every
+  # run or prepare is timed stage by stage; with metrics_file the record is
+  # written there and with profile_file the run is profiled. With a store,
+  # every prepared puzzle is recorded in it and opening the latest one is a
+  # lookup there. Every source implements fetch and day_for_index.
+  name = None
+  image_extension = None
+  cell_y_min = None
+  cell_y_max = 255
+
+  def __init__(self, folder='.', grid_shape=default_grid_shape, legacy_kmeans=False, metrics_file=None,
+               profile_file=None, store=None, **stages):
+    self.folder = folder
+    self.store = store
+    self.metrics_file = metrics_file
+    self.profile_file = profile_file
+    self.metrics = RunMetrics('pipeline', self.name)
+    self.grid_shape = tuple(grid_shape)
+    self.legacy_kmeans = legacy_kmeans
+    for name, stage in stages.items():
+      if name not in stage_names:
+        raise TypeError('{} is not a pipeline stage'.format(name))
+      setattr(self, name, stage)
+    self.replaced_stages = {name: stageName(stage) for name, stage in stages.items() if name in detection_stages}
+
+  def image_file(self, crossword_index):
+    return os.path.join(self.folder, 'image-{}.{}'.format(crossword_index, self.image_extension))
+
+  @abstractmethod
+  def fetch(self, *args):
+    # downloads what the source publishes and returns the crossword index
+    pass
+
+  @abstractmethod
+  def day_for_index(self, crossword_index):
+    pass
+
+  def decode(self, filename):
+    import cv2
+    image_orig = cv2.imread(filename)
+    if image_orig is None:
+      raise IOError('cannot read {}'.format(filename))
+    return cv2.cvtColor(image_orig, cv2.COLOR_BGR2GRAY)
+
+  def locate(self, image_gray, shape):
+    # (ystarts, yends, xstarts, xends) of the cells
+    return equalCellBounds(image_gray, shape or self.grid_shape)
+
+  def classify(self, image_gray, bounds):
+    shape = (len(bounds[0]), len(bounds[2]))
+    counts = {}
+    result = classifyGridCells(image_gray, shape, self.cell_value, self.legacy_kmeans, bounds, counts)
+    self.metrics.count('kmeans_cells', counts['kmeans_cells'])
+    return result
+
+  def cell_value(self, y_val):
+    return cellValue(y_val, self.cell_y_min, self.cell_y_max)
+
+  def number(self, grid):
+    return numberGrid(grid)
+
+  def clues(self, crossword_index):
+    return readPuzzleClues(crossword_index, self.folder)
+
+  def export(self, grid, crossword_index, filename):
+    writeIpuzFile(buildPuzzle(grid, crossword_index, self.folder), filename)
+
+  def layout(self, shape):
+    # everything besides the image itself that the detected grid depends on
+    layout = {'cell_y_min': self.cell_y_min, 'cell_y_max': self.cell_y_max, 'shape': list(shape)}
+    if self.legacy_kmeans:
+      layout['legacy_kmeans'] = True
+    if self.replaced_stages:
+      layout['stages'] = self.replaced_stages
+    return layout
+
+  def detect(self, filename, shape=None, confidence=None):
+    # Primary data-structure
+    # each cell of grid contains 3 integers
+    # the first integer is 1 if it is a word cell else 0
+    # the second integer is horizontal clue index or 0
+    # the third boolean is vertical clue index or 0
+    image_gray = self.metrics.timed('decode', self.decode, filename)
+    bounds = self.metrics.timed('locate', self.locate, image_gray, shape)
+    values, cell_confidence = self.metrics.timed('classify', self.classify, image_gray, bounds)
+    self.metrics.count('cells', values.size)
+    self.metrics.count('ambiguous_cells', int(np.count_nonzero(cell_confidence < min_confidence)))
+    assert(np.isin(values, [0, 1]).all())
+    grid = np.zeros(values.shape + (3,), dtype=int)
+    grid[:, :, 0] = values
+    if confidence is not None:
+      confidence[:, :] = cell_confidence
+    self.metrics.timed('number', self.number, grid)
+    return grid
+
+  def settings(self):
+    return detectorSettings(self.layout(self.grid_shape))
+
+  def cached_grid(self, crossword_index):
+    if self.store:
+      grid = self.store.grid(self.name, crossword_index, self.settings())
+      if grid is not None:
+        return grid
+    return loadCachedGrid(self.image_file(crossword_index), self.layout(self.grid_shape))
+
+  def latest_puzzle(self):
+    # (crossword_index, grid) of the newest puzzle in the store that was
+    # detected the way this pipeline detects, or None
+    if not self.store:
+      return None
+    return self.store.latest_puzzle(self.name, self.settings())
+
+  def puzzle_record(self, crossword_index, grid):
+    # what the store keeps of a puzzle
+    return {
+      'source': self.name, 'crossword_index': crossword_index, 'day': self.day_for_index(crossword_index),
+      'files': {'image': self.image_file(crossword_index)}, 'settings': self.settings(), 'grid': grid,
+    }
+
+  def file_grid(self, filename):
+    layout = self.layout(self.grid_shape)
+    grid = loadCachedGrid(filename, layout)
+    if grid is not None:
+      self.metrics.count('grid_cache_hits')
+      return grid
+    self.metrics.count('grid_cache_misses')
+    grid = self.detect(filename)
+    storeCachedGrid(filename, layout, grid)
+    return grid
+
+  def grid(self, crossword_index):
+    return self.file_grid(self.image_file(crossword_index))
+
+  def prepare(self, crossword_index, progress=ignoreProgress, cancelled=neverCancelled):
+    # grid and clues of a fetched puzzle; None once cancelled
+    return self.measured(self.prepare_fetched, crossword_index, progress, cancelled)
+
+  def run(self, *fetch_args, progress=ignoreProgress, cancelled=neverCancelled):
+    # the whole pipeline short of export; fits PuzzleLoadThread when the
+    # fetch arguments are bound
+    return self.measured(self.fetch_and_prepare, fetch_args, progress, cancelled)
+
+  def prepare_fetched(self, crossword_index, progress, cancelled):
+    self.metrics.crossword_index = crossword_index
+    progress('Detecting grid', 40)
+    grid = self.grid(crossword_index)
+    if cancelled():
+      return None
+    progress('Reading clues', 90)
+    clues = self.metrics.timed('clues', self.clues, crossword_index)
+    if self.store:
+      self.metrics.timed('store', self.store.save_puzzles, [self.puzzle_record(crossword_index, grid)])
+    return crossword_index, grid, clues
+
+  def fetch_and_prepare(self, fetch_args, progress, cancelled):
+    progress('Fetching crossword', 10)
+    cache = httpCache()
+    requests, received_bytes = cache.requests, cache.received_bytes
+    crossword_index = self.metrics.timed('fetch', self.fetch, *fetch_args)
+    self.metrics.crossword_index = crossword_index
+    self.metrics.count('fetch_requests', cache.requests - requests)
+    self.metrics.count('fetch_bytes', cache.received_bytes - received_bytes)
+    if cancelled():
+      return None
+    return self.prepare_fetched(crossword_index, progress, cancelled)
+
+  def measured(self, function, *args):
+    # a fresh record for every run, written whether or not the run succeeds
+    self.metrics = RunMetrics('pipeline', self.name)
+    try:
+      result = profiled(self.profile_file, function, *args)
+      self.metrics.outcome = 'cancelled' if result is None else 'ok'
+      return result
+    except Exception as e:
+      self.metrics.outcome = type(e).__name__
+      raise
+    finally:
+      self.metrics.seconds['total'] = time.time() - self.metrics.started
+      if self.metrics_file:
+        writeMetrics(self.metrics_file, self.metrics.record())
+
+class EpaperPipeline(Pipeline):
+  # whole epaper pages, one a day; the grid is located on the page and the
+  # clues are cut out of it as images
+  name = 'epaper'
+  image_extension = 'png'
+  cell_y_min = 155
+
+  def fetch(self, day):
+    crossword_index = crosswordIndexForDay(day)
+    # a conditional GET through the HTTP cache, so an unchanged image costs a 304
+    status = downloadFile(newSession(), imageUrlForDay(day), self.image_file(crossword_index), fetch_timeout)
+    if status == 'fetched':
+      print('Crossword {} has been fetched from website'.format(crossword_index))
+    return crossword_index
+
+  def day_for_index(self, crossword_index):
+    return dayForCrosswordIndex(crossword_index)
+
+  def locate(self, image_gray, shape):
+    # without a shape the grid dimension is taken from the page; with one,
+    # the located grid is only used if it has the same shape
+    bounds = locateGrid(image_gray)
+    located_shape = None if bounds is None else (len(bounds[0]), len(bounds[2]))
+    shape = shape or located_shape or self.grid_shape
+    if located_shape != tuple(shape):
+      bounds = fixedCellBounds(shape)
+    return bounds
+
+  def clues(self, crossword_index):
+    # the right and down clue images, cut out once
+    right_clues_file = os.path.join(self.folder, 'right-clues-{}.png'.format(crossword_index))
+    down_clues_file = os.path.join(self.folder, 'down-clues-{}.png'.format(crossword_index))
+    if not (os.path.isfile(down_clues_file) and os.path.isfile(right_clues_file)):
+      import cv2
+      image_orig = cv2.imread(self.image_file(crossword_index))
+      cv2.imwrite(down_clues_file, image_orig[down_clues_top:down_clues_bottom, down_clues_left:down_clues_right])
+      cv2.imwrite(right_clues_file, image_orig[right_clues_top:right_clues_bottom, right_clues_left:right_clues_right])
+    return right_clues_file, down_clues_file
+
+  def puzzle_record(self, crossword_index, grid):
+    record = Pipeline.puzzle_record(self, crossword_index, grid)
+    record['files']['right_clues'] = os.path.join(self.folder, 'right-clues-{}.png'.format(crossword_index))
+    record['files']['down_clues'] = os.path.join(self.folder, 'down-clues-{}.png'.format(crossword_index))
+    return record
+
+  def layout(self, shape):
+    # the grid takes the shape located on the page, and the given shape only
+    # when no grid is found there
+    layout = Pipeline.layout(self, shape)
+    layout['shape'] = 'located'
+    layout['fallback_shape'] = list(shape)
+    layout.update({'grid_top': grid_top, 'grid_bottom': grid_bottom, 'grid_left': grid_left, 'grid_right': grid_right})
+    return layout
+
+class AnandabazarPipeline(Pipeline):
+  # the crossword web page: the image is the grid alone and the clues are
+  # text on the page
+  name = 'anandabazar'
+  image_extension = 'jpg'
+  cell_y_min = 130
+
+  def index_file(self):
+    return os.path.join(self.folder, 'crossword-index.txt')
+
+  def index_for_day(self, day):
+    return (day - datetime.date(2020, 4, 27)).days + 7606
+
+  def day_for_index(self, crossword_index):
+    return datetime.date(2020, 4, 27) + datetime.timedelta(days=int(crossword_index) - 7606)
+
+  def clue_files(self, crossword_index):
+    return (os.path.join(self.folder, 'horizontal-clues-{}.txt'.format(crossword_index)),
+            os.path.join(self.folder, 'vertical-clues-{}.txt'.format(crossword_index)))
+
+  def latest_index(self):
+    # the store knows every prepared puzzle; crossword-index.txt is what
+    # was used before it
+    if self.store:
+      crossword_index = self.store.latest_index(self.name)
+      if crossword_index is not None:
+        return str(crossword_index)
+    with open(self.index_file(), 'r') as f:
+      return f.readline().strip()
+
+  def need_to_fetch(self):
+    try:
+      crossword_index = int(self.latest_index())
+    except (IOError, ValueError):
+      return True
+    return self.index_for_day(datetime.date.today()) > crossword_index
+
+  def puzzle_record(self, crossword_index, grid):
+    record = Pipeline.puzzle_record(self, crossword_index, grid)
+    across_file, down_file = self.clue_files(crossword_index)
+    record['files'].update({'across': across_file, 'down': down_file})
+    try:
+      record['across'], record['down'] = readPuzzleClues(crossword_index, self.folder)
+    except IOError:
+      pass
+    return record
+
+  def fetch(self, url=crossword_url):
+    if not self.need_to_fetch():
+      return self.latest_index()
+    session = newSession()
+    # the page and the image go through the HTTP cache, so that asking again
+    # costs a 304 while nothing has changed
+    page, page_status = httpCache().get(session, url, fetch_timeout)
+    crossword_page = extractCrosswordPage(page)
+    crossword_index = convertBanglaDigitsToEnglishDigits(crossword_page['header'].split()[-1])
+
+    img_url = 'http:' + crossword_page['image_src']
+    image_status = downloadFile(session, img_url, self.image_file(crossword_index), fetch_timeout)
+
+    across_file, down_file = self.clue_files(crossword_index)
+    with open(across_file, 'wb') as f:
+      f.write(crossword_page['across'].encode('utf-8'))
+    with open(down_file, 'wb') as f:
+      f.write(crossword_page['down'].encode('utf-8'))
+    if not self.store:
+      # written last, so that the index never names a puzzle whose files are missing
+      with open(self.index_file(), 'w') as f:
+        f.write(crossword_index)
+
+    if 'fetched' in (page_status, image_status):
+      print('Crossword {} has been fetched from website'.format(crossword_index))
+    return crossword_index
+
+def fixedCellBounds(shape):
+  ystarts, yends = cellBounds(grid_bottom - grid_top, shape[0])
+  xstarts, xends = cellBounds(grid_right - grid_left, shape[1])
+  return ystarts + grid_top, yends + grid_top, xstarts + grid_left, xends + grid_left
+
+def pipelineForImage(filename, **kwargs):
+  # .png files are whole epaper pages, .jpg files are the grid alone as
+  # published on the crossword web page
+  if filename.endswith('.png'):
+    return EpaperPipeline(**kwargs)
+  return AnandabazarPipeline(**kwargs)
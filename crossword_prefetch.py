@@ -0,0 +1,111 @@
+import argparse
+import os
+import sys
+import time
+from datetime import date, datetime, timedelta
+from crossword_epaper import crosswordIndexForDay, newSession
+from crossword_backfill import fetchImage, parseDate
+from crossword_pipeline import EpaperPipeline
+from crossword_store import puzzleStore
+
+# seconds before the first retry; every miss doubles it up to the maximum
+initial_delay = 60
+max_delay = 3600
+# a published image that fails detection this often is skipped for the day
+max_detection_failures = 3
+
+def log(message):
+  print('{} {}'.format(datetime.now().isoformat(timespec='seconds'), message), flush=True)
+
+def backoffDelays(initial=initial_delay, maximum=max_delay):
+  delay = initial
+  while True:
+    yield delay
+    delay = min(delay * 2, maximum)
+
+def prefetchPipeline(session, metrics_file=None, profile_file=None):
+  # the epaper pipeline of crossword_grid, with a fetch that downloads the
+  # day's image unless it is already there and takes an empty or non-image
+  # response for an image that is not published yet
+  def fetch(day):
+    crossword_index = crosswordIndexForDay(day)
+    filename = pipeline.image_file(crossword_index)
+    if not os.path.isfile(filename):
+      size, _ = fetchImage(session, day, filename)
+      pipeline.metrics.count('fetch_requests')
+      pipeline.metrics.count('fetch_bytes', size)
+    return crossword_index
+  pipeline = EpaperPipeline(fetch=fetch, metrics_file=metrics_file, profile_file=profile_file, store=puzzleStore())
+  return pipeline
+
+def prefetchDay(pipeline, day):
+  # detects and caches the grid and clue images the same way crossword_grid
+  # does on open
+  crossword_index, grid, clue_files = pipeline.run(day)
+  return crossword_index
+
+def dropImage(pipeline, day):
+  filename = pipeline.image_file(crosswordIndexForDay(day))
+  if os.path.isfile(filename):
+    os.unlink(filename)
+
+def waitForDay(pipeline, day, delays, max_wait=None, sleep=time.sleep):
+  # polls until the day's image is published; None once max_wait seconds
+  # have passed without it. An image that cannot be detected is dropped and
+  # fetched again, and after max_detection_failures the day is given up so
+  # that the scheduler goes on with the next one
+  waited = 0
+  detection_failures = 0
+  for delay in delays:
+    try:
+      return prefetchDay(pipeline, day)
+    except IOError as e:
+      # requests' errors are IOErrors too
+      failure = 'not available yet ({})'.format(e)
+    except Exception as e:
+      # AssertionError from detect, cv2.error on a corrupt image, ...
+      failure = 'could not be detected ({}: {})'.format(type(e).__name__, e)
+      dropImage(pipeline, day)
+      detection_failures += 1
+    if detection_failures >= max_detection_failures or (max_wait is not None and waited + delay > max_wait):
+      log('Giving up on {}: {}'.format(day.isoformat(), failure))
+      return None
+    log('{} {}, retrying in {}s'.format(day.isoformat(), failure, delay))
+    sleep(delay)
+    waited += delay
+
+def sleepUntilDay(day, sleep=time.sleep):
+  # an epaper image never appears before its own date
+  seconds = (datetime.combine(day, datetime.min.time()) - datetime.now()).total_seconds()
+  if seconds > 0:
+    log('Waiting {:.0f}s for {}'.format(seconds, day.isoformat()))
+    sleep(seconds)
+
+def runScheduler(first_day, once=False, max_wait=None, initial=initial_delay, maximum=max_delay,
+                 metrics_file=None, profile_file=None):
+  pipeline = prefetchPipeline(newSession(), metrics_file, profile_file)
+  day = first_day
+  while True:
+    sleepUntilDay(day)
+    crossword_index = waitForDay(pipeline, day, backoffDelays(initial, maximum), max_wait)
+    if crossword_index is not None:
+      log('Crossword {} for {} is ready'.format(crossword_index, day.isoformat()))
+    if once:
+      return crossword_index
+    day += timedelta(days=1)
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description='Fetch and detect upcoming crosswords before the app is opened')
+  parser.add_argument('--day', type=parseDate, default=date.today(), help='first date to prefetch, YYYY-MM-DD (default: today)')
+  parser.add_argument('--once', action='store_true', help='stop after the first date instead of following every next day')
+  parser.add_argument('--max-wait', type=float, default=None, help='seconds to keep retrying one date (default: until it appears)')
+  parser.add_argument('--initial-delay', type=float, default=initial_delay, help='seconds before the first retry')
+  parser.add_argument('--max-delay', type=float, default=max_delay, help='longest wait between retries')
+  parser.add_argument('--metrics', default=None, help='file every attempt is recorded in, .prom for Prometheus text, JSON lines otherwise')
+  parser.add_argument('--profile', default=None, help='file the cProfile stats of the last attempt are dumped to')
+  args = parser.parse_args()
+
+  crossword_index = runScheduler(args.day, args.once, args.max_wait, args.initial_delay, args.max_delay,
+                                 args.metrics, args.profile)
+  if args.once and crossword_index is None:
+    sys.exit(1)
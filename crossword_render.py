@@ -0,0 +1,69 @@
+from collections import OrderedDict
+from PySide2.QtGui import QBrush, QColor, QFont, QGuiApplication
+from crossword_icons import clueIcon, clueIconAtlas
+
+# most Qt objects kept at once; a 15x15 grid needs well under a hundred
+max_render_resources = 1024
+
+class RenderResourceCache:
+  # least recently used cache of the brushes, colours, fonts and pixmaps
+  # handed out by the grid models and painted by the delegate, so that
+  # repaints do not allocate Qt objects
+  def __init__(self, max_size=max_render_resources):
+    self.max_size = max_size
+    self.resources = OrderedDict()
+    self.hits = 0
+    self.misses = 0
+
+  def get(self, key, create):
+    resource = self.resources.get(key)
+    if resource is not None:
+      self.hits += 1
+      self.resources.move_to_end(key)
+      return resource
+    self.misses += 1
+    resource = create()
+    self.resources[key] = resource
+    if len(self.resources) > self.max_size:
+      self.resources.popitem(last=False)
+    return resource
+
+  def clear(self):
+    self.resources.clear()
+    self.hits = 0
+    self.misses = 0
+
+  def stats(self):
+    return {'hits': self.hits, 'misses': self.misses, 'size': len(self.resources)}
+
+render_cache = RenderResourceCache()
+
+def devicePixelRatio():
+  app = QGuiApplication.instance()
+  return app.devicePixelRatio() if app else 1.0
+
+def clueIconPixmap(clue_index, icon_width, icon_height, font_name, device_pixel_ratio=None):
+  # icons are rendered in device pixels so that they stay sharp on high
+  # density screens
+  device_pixel_ratio = device_pixel_ratio or devicePixelRatio()
+  pixel_width = int(round(icon_width * device_pixel_ratio))
+  pixel_height = int(round(icon_height * device_pixel_ratio))
+  def create():
+    atlas = render_cache.get(('atlas', pixel_width, pixel_height, font_name),
+                             lambda: clueIconAtlas(pixel_width, pixel_height, font_name))
+    return clueIcon(clue_index, pixel_width, pixel_height, font_name, device_pixel_ratio, atlas)
+  return render_cache.get(('pixmap', clue_index, icon_width, icon_height, font_name, device_pixel_ratio), create)
+
+def clueBrush(clue_index, icon_width, icon_height, font_name, device_pixel_ratio=None):
+  device_pixel_ratio = device_pixel_ratio or devicePixelRatio()
+  def create():
+    brush = QBrush()
+    brush.setTexture(clueIconPixmap(clue_index, icon_width, icon_height, font_name, device_pixel_ratio))
+    return brush
+  return render_cache.get(('brush', clue_index, icon_width, icon_height, font_name, device_pixel_ratio), create)
+
+def cellColor(color):
+  return render_cache.get(('color', color), lambda: QColor(color))
+
+def cellFont(font_name, font_size, weight=QFont.Normal):
+  return render_cache.get(('font', font_name, font_size, weight), lambda: QFont(font_name, font_size, weight))
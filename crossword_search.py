@@ -0,0 +1,151 @@
+import argparse
+import math
+import re
+import time
+import unicodedata
+from crossword_store import PuzzleStore, store_file
+
+# a term is a run of letters, digits and the vowel signs and other marks of
+# Bangla words, which \w alone splits words at
+term_pattern = re.compile(r'(?:[^\W_]|[ঀ-৿])+')
+# joiners only change how a conjunct is drawn
+joiners = str.maketrans('', '', '‌‍')
+# a query term also matches the longer terms it starts, such as the
+# inflected forms of a word, for this share of the score
+prefix_weight = 0.5
+search_limit = 20
+# clues scored per query, taken from the rarest query terms first
+candidate_limit = 200
+
+def clueTerms(text):
+  # NFC turns the precomposed য় ড় ঢ় into the same code points as the typed
+  # ones, and digits are compared as English digits
+  from crossword_pipeline import convertBanglaDigitsToEnglishDigits
+  text = convertBanglaDigitsToEnglishDigits(unicodedata.normalize('NFC', text).translate(joiners)).lower()
+  return term_pattern.findall(text)
+
+def termWeights(clue):
+  # how often each term is in a clue, over the square root of its length
+  terms = clueTerms(clue)
+  counts = {}
+  for term in terms:
+    counts[term] = counts.get(term, 0) + 1
+  return {term: count / math.sqrt(len(terms)) for term, count in counts.items()}
+
+def indexPuzzleClues(connection, source, crossword_index, clues):
+  # replaces the postings of a puzzle and keeps the number of clues of every
+  # term up to date; clues are (direction, number, clue) and connection is
+  # already inside the transaction that wrote them
+  crossword_index = int(crossword_index)
+  old_counts = connection.execute(
+    'SELECT term, COUNT(*) FROM clue_terms WHERE source = ? AND crossword_index = ? GROUP BY term',
+    (source, crossword_index)).fetchall()
+  connection.executemany('UPDATE clue_term_counts SET clues = clues - ? WHERE term = ?', [(count, term) for term, count in old_counts])
+  connection.execute('DELETE FROM clue_terms WHERE source = ? AND crossword_index = ?', (source, crossword_index))
+  postings = []
+  counts = {}
+  for direction, number, clue in clues:
+    for term, weight in termWeights(clue).items():
+      postings.append((term, source, crossword_index, direction, int(number), weight))
+      counts[term] = counts.get(term, 0) + 1
+  connection.executemany(
+    'INSERT INTO clue_terms (term, source, crossword_index, direction, number, weight) VALUES (?, ?, ?, ?, ?, ?)', postings)
+  connection.executemany(
+    'INSERT INTO clue_term_counts (term, clues) VALUES (?, ?) ON CONFLICT (term) DO UPDATE SET clues = clues + excluded.clues',
+    list(counts.items()))
+  connection.executemany('DELETE FROM clue_term_counts WHERE term = ? AND clues <= 0', [(term,) for term, _ in old_counts])
+
+def indexMissingClues(store):
+  # indexes the puzzles whose clues were stored before there was an index;
+  # returns how many
+  connection = store.connection()
+  missing = connection.execute(
+    'SELECT DISTINCT c.source, c.crossword_index FROM clues c WHERE NOT EXISTS '
+    '(SELECT 1 FROM clue_terms t WHERE t.source = c.source AND t.crossword_index = c.crossword_index)').fetchall()
+  with store.transaction() as connection:
+    for source, crossword_index in missing:
+      clues = connection.execute(
+        'SELECT direction, number, clue FROM clues WHERE source = ? AND crossword_index = ?',
+        (source, crossword_index)).fetchall()
+      indexPuzzleClues(connection, source, crossword_index, clues)
+  return len(missing)
+
+indexed_stores = set()
+
+def indexStore(store):
+  # indexMissingClues once per store; returns how many puzzles it indexed
+  if store.path in indexed_stores:
+    return 0
+  indexed = indexMissingClues(store)
+  indexed_stores.add(store.path)
+  return indexed
+
+def searchClues(store, query, source=None, limit=search_limit):
+  # (score, source, crossword_index, direction, number, clue) of the best
+  # matching clues; clues with more of the query terms come first, then by
+  # tf-idf. Candidates come from the postings of the rarest query terms,
+  # best weight first, so a common term never has all its clues scored.
+  indexStore(store)
+  connection = store.connection()
+  clue_count = connection.execute('SELECT COUNT(*) FROM clues').fetchone()[0]
+  # every indexed term each query term matches, with its idf
+  expansions = {}
+  for term in set(clueTerms(query)):
+    expansions[term] = {expansion: math.log(1 + clue_count / clues) for expansion, clues in connection.execute(
+      'SELECT term, clues FROM clue_term_counts WHERE term >= ? AND term < ?', (term, term + '\U0010ffff'))}
+  source_filter = '' if source is None else ' AND source = ?'
+  candidates = set()
+  for term in sorted(expansions, key=lambda term: -max(expansions[term].values(), default=0)):
+    for expansion in sorted(expansions[term], key=expansions[term].get, reverse=True):
+      if len(candidates) >= candidate_limit:
+        break
+      candidates.update(connection.execute(
+        'SELECT source, crossword_index, direction, number FROM clue_terms WHERE term = ?' + source_filter +
+        ' ORDER BY weight DESC LIMIT ?', (expansion,) + (() if source is None else (source,)) + (candidate_limit - len(candidates),)))
+
+  ranked = []
+  for candidate in candidates:
+    weights = dict(connection.execute(
+      'SELECT term, weight FROM clue_terms WHERE source = ? AND crossword_index = ? AND direction = ? AND number = ?', candidate))
+    matched = 0
+    score = 0
+    for term, idfs in expansions.items():
+      term_score = max([(1 if clue_term == term else prefix_weight) * idfs[clue_term] * weight
+                        for clue_term, weight in weights.items() if clue_term in idfs], default=0)
+      if term_score:
+        matched += 1
+        score += term_score
+    ranked.append((matched, score, candidate))
+  ranked.sort(reverse=True)
+
+  hits = []
+  for _, score, candidate in ranked[:limit]:
+    clue = connection.execute(
+      'SELECT clue FROM clues WHERE source = ? AND crossword_index = ? AND direction = ? AND number = ?', candidate).fetchone()[0]
+    hits.append((score,) + candidate + (clue,))
+  return hits
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description='Search the clues of every stored puzzle')
+  parser.add_argument('query', nargs='?', help='words to look for; Bangla or English digits alike')
+  parser.add_argument('--source', choices=['anandabazar', 'epaper'], help='only puzzles of this source')
+  parser.add_argument('--limit', type=int, default=search_limit)
+  parser.add_argument('--store', default=store_file, help='SQLite file of the store')
+  parser.add_argument('--reindex', action='store_true', help='index the clues of every puzzle again')
+  args = parser.parse_args()
+
+  store = PuzzleStore(args.store)
+  if args.reindex:
+    with store.transaction() as connection:
+      connection.execute('DELETE FROM clue_terms')
+      connection.execute('DELETE FROM clue_term_counts')
+  started = time.perf_counter()
+  indexed = indexStore(store)
+  if indexed:
+    print('Indexed the clues of {} puzzles in {:.1f}s'.format(indexed, time.perf_counter() - started))
+  if args.query:
+    started = time.perf_counter()
+    hits = searchClues(store, args.query, args.source, args.limit)
+    for score, source, crossword_index, direction, number, clue in hits:
+      print('{:6.2f} {} {} {} {}: {}'.format(score, source, crossword_index, direction, number, clue))
+    print('{} hits in {:.1f} ms'.format(len(hits), 1000 * (time.perf_counter() - started)))
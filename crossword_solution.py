@@ -0,0 +1,59 @@
+import hashlib
+import json
+import numpy as np
+
+# solution-<index>.txt files are only read, to move the solutions saved
+# before the store into it; the store writes solutions itself
+solution_format = 'crossword-solution'
+solution_format_version = 1
+# cells are joined with the ASCII unit separator, which cannot be typed
+cell_separator = '\x1f'
+
+def solutionPath(crossword_index):
+  return 'solution-{}.txt'.format(crossword_index)
+
+def gridHash(grid_data):
+  # only the word cells matter, the clue numbers follow from them
+  digest = hashlib.sha256(np.ascontiguousarray(grid_data[:, :, 0], dtype=np.uint8).tobytes())
+  return digest.hexdigest()[:16]
+
+def legacySolutionCells(text, shape):
+  # older files hold one line per cell and nothing else
+  lines = text.split('\n')
+  if lines[-1] == '':
+    lines.pop()
+  if len(lines) != shape[0] * shape[1]:
+    raise ValueError('legacy solution has {} cells, grid has {}'.format(len(lines), shape[0] * shape[1]))
+  return [line.strip() for line in lines]
+
+def readSolution(filename, grid_data):
+  # returns the solution as an object array of the grid's shape; files are
+  # either one JSON header line followed by every cell in reading order, or
+  # the older one line per cell. ValueError if it belongs to another grid
+  with open(filename, 'rb') as f:
+    text = f.read().decode('utf-8')
+  shape = grid_data.shape[:2]
+  header_line, _, payload = text.partition('\n')
+  try:
+    header = json.loads(header_line)
+  except ValueError:
+    header = None
+  if not isinstance(header, dict) or header.get('format') != solution_format:
+    cells = legacySolutionCells(text, shape)
+  else:
+    if header.get('version', 0) > solution_format_version:
+      raise ValueError('solution format version {} is newer than {}'.format(header['version'], solution_format_version))
+    if tuple(header.get('shape', ())) != tuple(shape) or header.get('grid') != gridHash(grid_data):
+      raise ValueError('solution belongs to a different grid')
+    cells = payload.split(cell_separator)
+    if len(cells) != shape[0] * shape[1]:
+      raise ValueError('solution has {} cells, grid has {}'.format(len(cells), shape[0] * shape[1]))
+  return np.array(cells, dtype=object).reshape(shape)
+
+def changedBounds(changed):
+  # (top, left, bottom, right) of the cells set in a boolean mask, or None
+  rows = np.flatnonzero(changed.any(axis=1))
+  if not len(rows):
+    return None
+  columns = np.flatnonzero(changed.any(axis=0))
+  return int(rows[0]), int(columns[0]), int(rows[-1]), int(columns[-1])
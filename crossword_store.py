@@ -0,0 +1,312 @@
+import argparse
+import json
+import os
+import re
+import sqlite3
+import threading
+from datetime import date, datetime
+import numpy as np
+from crossword_solution import cell_separator, gridHash
+
+store_file = 'crosswords.sqlite'
+# puzzles written per transaction by importFolder
+import_batch_size = 200
+
+schema = '''
+CREATE TABLE IF NOT EXISTS puzzles (
+  source TEXT NOT NULL,
+  crossword_index INTEGER NOT NULL,
+  day TEXT,
+  files TEXT NOT NULL DEFAULT '{}',
+  settings TEXT,
+  rows INTEGER,
+  columns INTEGER,
+  grid BLOB,
+  updated TEXT NOT NULL,
+  PRIMARY KEY (source, crossword_index)
+);
+CREATE INDEX IF NOT EXISTS puzzles_day ON puzzles (day);
+CREATE TABLE IF NOT EXISTS clues (
+  source TEXT NOT NULL,
+  crossword_index INTEGER NOT NULL,
+  direction TEXT NOT NULL,
+  number INTEGER NOT NULL,
+  clue TEXT NOT NULL,
+  PRIMARY KEY (source, crossword_index, direction, number)
+);
+CREATE TABLE IF NOT EXISTS clue_terms (
+  term TEXT NOT NULL,
+  source TEXT NOT NULL,
+  crossword_index INTEGER NOT NULL,
+  direction TEXT NOT NULL,
+  number INTEGER NOT NULL,
+  weight REAL NOT NULL,
+  PRIMARY KEY (term, source, crossword_index, direction, number)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS clue_terms_weight ON clue_terms (term, weight DESC);
+CREATE INDEX IF NOT EXISTS clue_terms_clue ON clue_terms (source, crossword_index, direction, number);
+CREATE TABLE IF NOT EXISTS clue_term_counts (
+  term TEXT PRIMARY KEY,
+  clues INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS solutions (
+  source TEXT NOT NULL,
+  crossword_index INTEGER NOT NULL,
+  grid_hash TEXT NOT NULL,
+  rows INTEGER NOT NULL,
+  columns INTEGER NOT NULL,
+  cells TEXT NOT NULL,
+  filled INTEGER NOT NULL,
+  word_cells INTEGER NOT NULL,
+  updated TEXT NOT NULL,
+  PRIMARY KEY (source, crossword_index)
+);
+CREATE INDEX IF NOT EXISTS solutions_unfinished ON solutions (updated) WHERE filled < word_cells;
+'''
+
+def gridBlob(grid):
+  # the three layers of a grid fit in 16 bits per value
+  return np.ascontiguousarray(grid, dtype='<u2').tobytes()
+
+def blobGrid(blob, rows, columns):
+  return np.frombuffer(blob, dtype='<u2').reshape(rows, columns, 3).astype(int)
+
+def now():
+  return datetime.now().isoformat(timespec='seconds')
+
+class PuzzleStore:
+  # puzzles, their detected grids, clues and solutions in one SQLite file;
+  # every thread gets its own connection, and WAL lets the UI thread read
+  # while the autosave thread writes
+  def __init__(self, path=store_file):
+    self.path = path
+    self.local = threading.local()
+
+  def connection(self):
+    connection = getattr(self.local, 'connection', None)
+    if connection is None:
+      connection = sqlite3.connect(self.path, timeout=30)
+      connection.execute('PRAGMA journal_mode=WAL')
+      connection.execute('PRAGMA synchronous=NORMAL')
+      connection.executescript(schema)
+      self.local.connection = connection
+    return connection
+
+  def transaction(self):
+    # commits on success and rolls back on an exception, as a with block
+    return self.connection()
+
+  def save_puzzles(self, puzzles):
+    # puzzles are dicts with source, crossword_index and any of day, files,
+    # settings, grid, across and down; all of them in one transaction. What a
+    # puzzle leaves out keeps its stored value
+    with self.transaction() as connection:
+      for puzzle in puzzles:
+        source, crossword_index = puzzle['source'], int(puzzle['crossword_index'])
+        grid = puzzle.get('grid')
+        day = puzzle.get('day')
+        connection.execute(
+          'INSERT INTO puzzles (source, crossword_index, day, files, settings, rows, columns, grid, updated) '
+          'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) '
+          'ON CONFLICT (source, crossword_index) DO UPDATE SET day = COALESCE(excluded.day, puzzles.day), '
+          "files = CASE excluded.files WHEN '{}' THEN puzzles.files ELSE excluded.files END, "
+          'settings = COALESCE(excluded.settings, puzzles.settings), rows = COALESCE(excluded.rows, puzzles.rows), '
+          'columns = COALESCE(excluded.columns, puzzles.columns), grid = COALESCE(excluded.grid, puzzles.grid), '
+          'updated = excluded.updated',
+          (source, crossword_index, day and day.isoformat(), json.dumps(puzzle.get('files', {})), puzzle.get('settings'),
+           None if grid is None else grid.shape[0], None if grid is None else grid.shape[1],
+           None if grid is None else gridBlob(grid), now()))
+        if 'across' in puzzle or 'down' in puzzle:
+          clues = [(direction, int(number), clue) for direction in ('across', 'down') for number, clue in puzzle.get(direction, [])]
+          connection.execute('DELETE FROM clues WHERE source = ? AND crossword_index = ?', (source, crossword_index))
+          connection.executemany(
+            'INSERT INTO clues (source, crossword_index, direction, number, clue) VALUES (?, ?, ?, ?, ?)',
+            [(source, crossword_index) + clue for clue in clues])
+          # the search index follows the clues in the same transaction
+          from crossword_search import indexPuzzleClues
+          indexPuzzleClues(connection, source, crossword_index, clues)
+
+  def save_puzzle(self, **puzzle):
+    self.save_puzzles([puzzle])
+
+  def grid(self, source, crossword_index, settings):
+    # the detected grid, if it was detected with these settings
+    row = self.connection().execute(
+      'SELECT rows, columns, grid FROM puzzles WHERE source = ? AND crossword_index = ? AND settings = ?',
+      (source, int(crossword_index), settings)).fetchone()
+    if row is None or row[2] is None:
+      return None
+    return blobGrid(row[2], row[0], row[1])
+
+  def latest_puzzle(self, source, settings):
+    # (crossword_index, grid) of the newest puzzle detected with these settings
+    row = self.connection().execute(
+      'SELECT crossword_index, rows, columns, grid FROM puzzles WHERE source = ? AND settings = ? AND grid IS NOT NULL '
+      'ORDER BY crossword_index DESC LIMIT 1', (source, settings)).fetchone()
+    if row is None:
+      return None
+    return row[0], blobGrid(row[3], row[1], row[2])
+
+  def latest_index(self, source):
+    row = self.connection().execute(
+      'SELECT MAX(crossword_index) FROM puzzles WHERE source = ?', (source,)).fetchone()
+    return row[0]
+
+  def clues(self, source, crossword_index):
+    # across and down (number, clue) pairs in clue number order, as
+    # readPuzzleClues returns them
+    clues = {'across': [], 'down': []}
+    for direction, number, clue in self.connection().execute(
+        'SELECT direction, number, clue FROM clues WHERE source = ? AND crossword_index = ? ORDER BY number',
+        (source, int(crossword_index))):
+      clues[direction].append((str(number), clue))
+    return clues['across'], clues['down']
+
+  def files(self, source, crossword_index):
+    row = self.connection().execute(
+      'SELECT files FROM puzzles WHERE source = ? AND crossword_index = ?', (source, int(crossword_index))).fetchone()
+    return json.loads(row[0]) if row else {}
+
+  def puzzles_on_day(self, day):
+    return self.connection().execute(
+      'SELECT source, crossword_index FROM puzzles WHERE day = ? ORDER BY source', (day.isoformat(),)).fetchall()
+
+  def puzzles_between(self, source, first_day, last_day):
+    # (crossword_index, day, grid, files) of the detected puzzles of a date
+    # range in date order, read as they are iterated
+    cursor = self.connection().execute(
+      'SELECT crossword_index, day, rows, columns, grid, files FROM puzzles '
+      'WHERE day BETWEEN ? AND ? AND source = ? AND grid IS NOT NULL ORDER BY day',
+      (first_day.isoformat(), last_day.isoformat(), source))
+    for crossword_index, day, rows, columns, grid, files in cursor:
+      yield crossword_index, day, blobGrid(grid, rows, columns), json.loads(files)
+
+  def save_solution(self, source, crossword_index, grid_hash, cells, shape, filled, word_cells):
+    # the two sources number their puzzles independently, so a solution is
+    # keyed by both like a puzzle
+    with self.transaction() as connection:
+      connection.execute(
+        'INSERT OR REPLACE INTO solutions (source, crossword_index, grid_hash, rows, columns, cells, filled, word_cells, updated) '
+        'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+        (source, int(crossword_index), grid_hash, shape[0], shape[1], cell_separator.join(cells), filled, word_cells, now()))
+
+  def read_solution(self, source, crossword_index, grid_data):
+    # the solution as an object array of the grid's shape; IOError if there
+    # is none and ValueError if it belongs to another grid, as readSolution
+    row = self.connection().execute(
+      'SELECT grid_hash, rows, columns, cells FROM solutions WHERE source = ? AND crossword_index = ?',
+      (source, int(crossword_index))).fetchone()
+    if row is None:
+      raise IOError('no saved solution for {}'.format(crossword_index))
+    grid_hash, rows, columns, cells = row
+    shape = grid_data.shape[:2]
+    if (rows, columns) != tuple(shape) or grid_hash != gridHash(grid_data):
+      raise ValueError('solution belongs to a different grid')
+    return np.array(cells.split(cell_separator), dtype=object).reshape(shape)
+
+  def load_puzzles(self, source):
+    # every detected puzzle of a source with its solution, as compact
+    # Puzzles so that thousands of them fit in memory
+    from crossword_compact import puzzleFromGrid
+    puzzles = []
+    for crossword_index, rows, columns, blob, grid_hash, solution in self.connection().execute(
+        'SELECT p.crossword_index, p.rows, p.columns, p.grid, s.grid_hash, s.cells FROM puzzles p '
+        'LEFT JOIN solutions s ON s.source = p.source AND s.crossword_index = p.crossword_index '
+        'WHERE p.source = ? AND p.grid IS NOT NULL ORDER BY p.crossword_index', (source,)):
+      grid = blobGrid(blob, rows, columns)
+      puzzle = puzzleFromGrid(crossword_index, grid)
+      # the stored cells are already joined the way Puzzle keeps them
+      if solution and solution.strip(cell_separator) and grid_hash == gridHash(grid):
+        puzzle.solution = solution
+      puzzles.append(puzzle)
+    return puzzles
+
+  def unfinished(self):
+    # (source, crossword_index, filled, word_cells, updated), most recent first
+    return self.connection().execute(
+      'SELECT source, crossword_index, filled, word_cells, updated FROM solutions WHERE filled < word_cells '
+      'ORDER BY updated DESC').fetchall()
+
+puzzle_store = None
+
+def puzzleStore():
+  # shared store of the app
+  global puzzle_store
+  if puzzle_store is None:
+    puzzle_store = PuzzleStore()
+  return puzzle_store
+
+def solutionRecord(solution_data, grid_data):
+  # what save_solution takes, built from a model's arrays
+  word_cells = grid_data[:, :, 0].astype(bool)
+  filled = int(np.count_nonzero((solution_data != '') & word_cells))
+  return gridHash(grid_data), list(solution_data.flat), solution_data.shape, filled, int(np.count_nonzero(word_cells))
+
+image_file_pattern = re.compile(r'image-(\d+)\.(png|jpg)$')
+solution_file_pattern = re.compile(r'solution-(\d+)\.txt$')
+
+def importFolder(store, folder='.', batch_size=import_batch_size):
+  # moves the loose files of a folder into the store, detecting grids that
+  # are not in the grid cache yet; returns (puzzles, solutions) imported
+  from crossword_pipeline import pipelineForImage
+  from crossword_solution import readSolution
+  puzzles = []
+  grids = {}
+  imported = 0
+  for name in sorted(os.listdir(folder)):
+    match = image_file_pattern.match(name)
+    if not match:
+      continue
+    pipeline = pipelineForImage(name, folder=folder)
+    crossword_index = match.group(1)
+    try:
+      puzzle = pipeline.puzzle_record(crossword_index, pipeline.grid(crossword_index))
+    except (IOError, ValueError, AssertionError) as e:
+      print('Skipping {}: {}'.format(name, e))
+      continue
+    grids.setdefault(int(crossword_index), []).append((pipeline.name, puzzle['grid']))
+    puzzles.append(puzzle)
+    if len(puzzles) >= batch_size:
+      store.save_puzzles(puzzles)
+      imported += len(puzzles)
+      puzzles = []
+  store.save_puzzles(puzzles)
+  imported += len(puzzles)
+
+  solutions = 0
+  for name in sorted(os.listdir(folder)):
+    match = solution_file_pattern.match(name)
+    # with an image of each source under the same index, the solution goes
+    # with the grid it fits
+    for source, grid in (grids.get(int(match.group(1)), []) if match else []):
+      try:
+        solution = readSolution(os.path.join(folder, name), grid)
+      except (IOError, ValueError) as e:
+        print('Skipping {} for {}: {}'.format(name, source, e))
+        continue
+      store.save_solution(source, match.group(1), *solutionRecord(solution, grid))
+      solutions += 1
+      break
+  return imported, solutions
+
+if __name__ == '__main__':
+  parser = argparse.ArgumentParser(description='Query the puzzle store or import loose puzzle files into it')
+  parser.add_argument('--store', default=store_file, help='SQLite file of the store')
+  commands = parser.add_subparsers(dest='command', required=True)
+  import_parser = commands.add_parser('import', help='import image-<index>.png/.jpg, clue and solution files')
+  import_parser.add_argument('folder', nargs='?', default='.')
+  commands.add_parser('unfinished', help='list puzzles with a solution that is not complete yet')
+  day_parser = commands.add_parser('day', help='find the puzzles of a date')
+  day_parser.add_argument('day', type=date.fromisoformat, help='YYYY-MM-DD')
+  args = parser.parse_args()
+
+  store = PuzzleStore(args.store)
+  if args.command == 'import':
+    imported, solutions = importFolder(store, args.folder)
+    print('Imported {} puzzles and {} solutions'.format(imported, solutions))
+  elif args.command == 'unfinished':
+    for source, crossword_index, filled, word_cells, updated in store.unfinished():
+      print('{} {} {}/{} cells, last played {}'.format(source, crossword_index, filled, word_cells, updated))
+  else:
+    for source, crossword_index in store.puzzles_on_day(args.day):
+      print('{} {}'.format(source, crossword_index))
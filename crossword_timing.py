@@ -0,0 +1,85 @@
+import os
+import sys
+import time
+from crossword_metrics import RunMetrics, commandLineValue, writeMetrics
+
+# modules that only fetching, detection and export need
+heavy_modules = ['cv2', 'requests', 'bs4', 'crossword', 'ipuz']
+
+# taken when the entry module imports this first, before anything heavy
+started = time.perf_counter()
+stages = []
+
+def markStage(name):
+  # time since the previous mark is booked under this stage
+  now = time.perf_counter()
+  previous = stages[-1][2] if stages else started
+  stages.append((name, now - previous, now))
+
+def startupReport():
+  lines = ['Startup took {:.0f} ms'.format(1000 * (stages[-1][2] - started) if stages else 0)]
+  for name, elapsed, _ in stages:
+    lines.append('  {:<10} {:>7.1f} ms'.format(name, 1000 * elapsed))
+  loaded = [name for name in heavy_modules if name in sys.modules]
+  lines.append('  heavy modules loaded: {}'.format(', '.join(loaded) or 'none'))
+  return '\n'.join(lines)
+
+def appName():
+  return os.path.splitext(os.path.basename(sys.argv[0]))[0]
+
+def startupMetrics():
+  metrics = RunMetrics('startup', appName())
+  metrics.started -= time.perf_counter() - started
+  metrics.outcome = 'ok'
+  metrics.seconds = {name: elapsed for name, elapsed, _ in stages}
+  metrics.counters = {'heavy_modules': sum(name in sys.modules for name in heavy_modules)}
+  return metrics
+
+def renderingReport():
+  # how the render cache and the grid's paints did over the whole run
+  from crossword_grid_widget import paintStats
+  from crossword_render import render_cache
+  cache = render_cache.stats()
+  paints = paintStats()
+  lookups = cache['hits'] + cache['misses']
+  return '\n'.join([
+    'Rendering',
+    '  render cache {} hits, {} misses ({:.0%} hits), {} kept'.format(
+      cache['hits'], cache['misses'], cache['hits'] / lookups if lookups else 0, cache['size']),
+    '  last {} paints {:.1f} ms mean, {:.1f} ms worst'.format(paints['paints'], paints['mean_ms'], paints['max_ms']),
+  ])
+
+def renderingMetrics():
+  from crossword_grid_widget import paintStats
+  from crossword_render import render_cache
+  cache = render_cache.stats()
+  paints = paintStats()
+  metrics = RunMetrics('rendering', appName())
+  metrics.outcome = 'ok'
+  metrics.seconds = {'paint_mean': paints['mean_ms'] / 1000, 'paint_max': paints['max_ms'] / 1000}
+  metrics.counters = {'render_cache_hits': cache['hits'], 'render_cache_misses': cache['misses'],
+                      'render_cache_size': cache['size'], 'paints': paints['paints']}
+  return metrics
+
+def reportStartupWhenShown():
+  # with --timing, prints the report once the event loop has shown the
+  # window and the rendering report when the app quits; with --metrics
+  # FILE, records them there
+  timing = '--timing' in sys.argv[1:]
+  metrics_file = commandLineValue('--metrics')
+  if not (timing or metrics_file):
+    return
+  from PySide2.QtCore import QCoreApplication, QTimer
+  def report():
+    markStage('window')
+    if timing:
+      print(startupReport())
+    if metrics_file:
+      writeMetrics(metrics_file, startupMetrics().record())
+  def reportRendering():
+    if timing:
+      print(renderingReport())
+    if metrics_file:
+      writeMetrics(metrics_file, renderingMetrics().record())
+  QTimer.singleShot(0, report)
+  QCoreApplication.instance().aboutToQuit.connect(reportRendering)